@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.template.backends.django import Template
+
+        from .auth import connect_signals
+        from .metrics import timed_render
+        connect_signals()
+        # время рендеринга для PerformanceMiddleware; include и
+        # шаблоны карточек внутри страницы отдельно не считаются
+        if not hasattr(Template.render, '__wrapped__'):
+            Template.render = timed_render(Template.render)
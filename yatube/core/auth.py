@@ -0,0 +1,55 @@
+"""Пользователь запроса из кэша.
+
+AuthenticationMiddleware на каждый запрос читает auth_user по id из
+сессии. CachedModelBackend держит строку пользователя в кэше; запись
+удаляется при сохранении пользователя (смена пароля, правка профиля,
+last_login при входе), при удалении и при выходе. Сессии - в
+SESSION_ENGINE cached_db: чтение из кэша, запись сразу и в БД.
+
+    AUTHENTICATION_BACKENDS = [
+        'core.auth.CachedModelBackend',
+        # сессии, открытые до перехода, ссылаются на прежний бэкенд
+        'django.contrib.auth.backends.ModelBackend',
+    ]
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.signals import user_logged_out
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+
+USER_CACHE_TIMEOUT: int = 10 * 60
+
+
+def user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        key = user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            # неактивных super() не возвращает, а смена is_active -
+            # это сохранение, которое удалит запись
+            cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
+
+
+def forget_user(sender, instance, **kwargs):
+    cache.delete(user_key(instance.pk))
+
+
+def forget_logged_out(sender, request, user, **kwargs):
+    if user is not None:
+        cache.delete(user_key(user.pk))
+
+
+def connect_signals():
+    User = get_user_model()
+    post_save.connect(forget_user, sender=User)
+    post_delete.connect(forget_user, sender=User)
+    user_logged_out.connect(forget_logged_out)
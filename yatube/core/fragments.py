@@ -0,0 +1,123 @@
+"""Страница, общая для всех зрителей, с "дырками" под пользователя.
+
+Страницу из кэша (см. posts.feed_cache) видят все, а от пользователя
+в ней зависят мелочи: меню в шапке, кнопка подписки, ссылка на
+правку поста, форма комментария. Шаблон размечает их тегами
+core.templatetags.fragment_tags:
+
+    {% fragment 'authenticated' %}...{% endfragment %}
+    {% fragment 'author' post.author_id %}...{% endfragment %}
+    {% fragment_value 'username' %}
+
+Обычно теги сразу проверяют условие и подставляют значение. Если же
+страница рендерится для общего кэша (shared_render), в HTML остаются
+оба варианта в метках-комментариях, а fill при каждой выдаче
+оставляет нужные блоки и подставляет значения текущего пользователя:
+это один проход регулярным выражением без шаблонов.
+
+Внутри блока - только то, что одинаково для всех; значения
+пользователя - через fragment_value. Блоки не вкладываются друг
+в друга. Условия и значения регистрируются condition и value
+(условия постов - в posts.fragments).
+"""
+import re
+from contextlib import contextmanager
+
+from django.middleware.csrf import get_token
+from django.utils.html import escape
+
+CONDITIONS = {}
+VALUES = {}
+BLOCK = re.compile(
+    r'<!--fragment:(?P<name>\w+)(?P<args>(?::\w+)*)-->'
+    r'(?P<content>.*?)<!--/fragment-->',
+    re.DOTALL
+)
+VALUE = re.compile(r'<!--value:(?P<name>\w+)-->')
+
+
+def condition(name):
+    """Регистрирует условие блока: func(request, *args) -> bool."""
+    def decorator(func):
+        CONDITIONS[name] = func
+        return func
+    return decorator
+
+
+def value(name):
+    """Регистрирует значение: func(request) -> str (экранируется)."""
+    def decorator(func):
+        VALUES[name] = func
+        return func
+    return decorator
+
+
+@contextmanager
+def shared_render(request):
+    """Рендеринг страницы для всех зрителей: теги оставляют метки."""
+    request.shared_render = True
+    try:
+        yield
+    finally:
+        request.shared_render = False
+
+
+def is_shared(request):
+    return getattr(request, 'shared_render', False)
+
+
+def check(request, name, args):
+    """Аргументы - строки, как их прочтет fill из метки."""
+    return CONDITIONS[name](request, *map(str, args))
+
+
+def get_value(request, name):
+    return escape(VALUES[name](request))
+
+
+def block_marker(name, args, content):
+    opening = ':'.join(['fragment', name, *map(str, args)])
+    return f'<!--{opening}-->{content}<!--/fragment-->'
+
+
+def value_marker(name):
+    return f'<!--value:{name}-->'
+
+
+def fill(request, response):
+    """Подставляет в общую страницу части текущего пользователя."""
+    if response.streaming or not (
+            b'<!--fragment:' in response.content
+            or b'<!--value:' in response.content):
+        return response
+    content = response.content.decode(response.charset)
+    content = BLOCK.sub(
+        lambda match: match['content'] if check(
+            request, match['name'], match['args'].split(':')[1:]
+        ) else '',
+        content
+    )
+    content = VALUE.sub(
+        lambda match: get_value(request, match['name']), content)
+    response.content = content.encode(response.charset)
+    return response
+
+
+@condition('authenticated')
+def authenticated(request):
+    return request.user.is_authenticated
+
+
+@condition('anonymous')
+def anonymous(request):
+    return not request.user.is_authenticated
+
+
+@value('username')
+def username(request):
+    return request.user.get_username()
+
+
+@value('csrf_token')
+def csrf_token(request):
+    return get_token(request)
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+BACKENDS = {
+    'locmem': lambda directory: LocMemCache(
+        'bench', {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+    'filebased': lambda directory: FileBasedCache(
+        os.path.join(directory, 'files'),
+        {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+    'sqlite': lambda directory: SQLiteCache(
+        os.path.join(directory, 'cache.sqlite3'),
+        {'OPTIONS': {'MAX_ENTRIES': 10 ** 6}}),
+}
+# страница ленты в кэше - десятки килобайт HTML
+VALUE = 'x' * 20 * 1024
+
+
+def run_operations(backend, directory, operations):
+    """Выполняется в процессе пула: {операция: операций в секунду}."""
+    cache = BACKENDS[backend](directory)
+    pid = os.getpid()
+    keys = [f'bench:{pid}:{i}' for i in range(operations)]
+    cache.set(f'counter:{pid}', 0)
+    workloads = {
+        'set': lambda key: cache.set(key, VALUE),
+        'get': lambda key: cache.get(key),
+        'get_miss': lambda key: cache.get(key + ':miss'),
+        'get_many': lambda key: cache.get_many(keys[:10]),
+        'incr': lambda key: cache.incr(f'counter:{pid}'),
+    }
+    result = {}
+    for name, workload in workloads.items():
+        started = time.perf_counter()
+        for key in keys:
+            workload(key)
+        result[name] = operations / (time.perf_counter() - started)
+    return result
+
+
+def shared_hits(backend, directory, keys):
+    """Доля ключей, записанных другим процессом, которые этот видит."""
+    cache = BACKENDS[backend](directory)
+    return sum(cache.get(key) is not None for key in keys) / len(keys)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache: '
+            'скорость операций в нескольких процессах и общий ли кэш')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--processes', type=int, default=4)
+
+    def handle(self, *args, operations, processes, **options):
+        for backend in BACKENDS:
+            with tempfile.TemporaryDirectory() as directory, \
+                    ProcessPoolExecutor(max_workers=processes) as pool:
+                results = list(pool.map(
+                    run_operations, [backend] * processes,
+                    [directory] * processes, [operations] * processes))
+                # ключи пишет этот процесс, читает процесс пула
+                cache = BACKENDS[backend](directory)
+                keys = [f'shared:{i}' for i in range(100)]
+                cache.set_many({key: 1 for key in keys})
+                hits = pool.submit(
+                    shared_hits, backend, directory, keys).result()
+            totals = ' '.join(
+                f'{name}={sum(result[name] for result in results):.0f}/с'
+                for name in results[0]
+            )
+            self.stdout.write(
+                f'{backend:<10} {totals} общий кэш: {hits:.0%}')
@@ -0,0 +1,33 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Удаляет просроченные сессии пачками: один большой DELETE '
+            'надолго держит блокировку записи SQLite')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='пауза между пачками, секунд: окно для других записей'
+        )
+
+    def handle(self, *args, batch_size, pause, **options):
+        now = timezone.now()
+        expired = Session.objects.filter(expire_date__lt=now)
+        deleted = 0
+        while True:
+            keys = list(
+                expired.values_list('session_key', flat=True)[:batch_size])
+            if keys:
+                deleted += Session.objects.filter(
+                    session_key__in=keys).delete()[0]
+            if len(keys) < batch_size:
+                break
+            time.sleep(pause)
+        # записи cached_db в кэше истекают сами вместе с сессией
+        self.stdout.write(f'Удалено сессий: {deleted}')
@@ -0,0 +1,48 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from core.routers import replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную базу SQLite в реплики из DATABASE_REPLICAS '
+            '(замена репликации для локальной разработки)')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='повторять каждые N секунд, 0 - один раз'
+        )
+
+    def handle(self, *args, interval, **options):
+        source = connections[DEFAULT_DB_ALIAS]
+        if source.vendor != 'sqlite':
+            raise CommandError(
+                'Копировать можно только SQLite: другие СУБД '
+                'реплицируют себя сами')
+        if not replicas():
+            raise CommandError(
+                'Реплик нет: укажите путь в YATUBE_REPLICA_DB')
+        while True:
+            self.sync(source)
+            if not interval:
+                break
+            time.sleep(interval)
+
+    def sync(self, source):
+        source.ensure_connection()
+        for alias in replicas():
+            started = time.monotonic()
+            # backup API дает согласованный снимок даже при записи
+            # в основную базу и не мешает читателям реплики
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(
+                f'{alias}: {time.monotonic() - started:.2f} с')
@@ -0,0 +1,222 @@
+"""Метрики запросов по представлениям: время ответа, запросы к БД,
+рендеринг шаблонов и обращения к кэшу. Копятся в памяти процесса
+гистограммами (у каждого воркера свои), собирает их
+core.middleware.PerformanceMiddleware."""
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# верхние границы корзин гистограмм, для времени - в миллисекундах
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+TIMINGS = ('wall_ms', 'db_ms', 'template_ms')
+
+_local = threading.local()
+_MISSING = object()
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # последняя корзина - все, что больше верхней границы
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def as_dict(self):
+        labels = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.total,
+            'sum': round(self.sum, 3),
+            'max': round(self.max, 3),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.histograms = {name: Histogram(TIME_BUCKETS) for name in TIMINGS}
+        self.histograms['queries'] = Histogram(QUERY_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.page_cache = Counter()
+
+    def add(self, request_metrics):
+        for name, histogram in self.histograms.items():
+            histogram.observe(getattr(request_metrics, name))
+        self.cache_hits += request_metrics.cache_hits
+        self.cache_misses += request_metrics.cache_misses
+        if request_metrics.page_cache is not None:
+            self.page_cache[request_metrics.page_cache] += 1
+
+    def as_dict(self):
+        data = {
+            name: histogram.as_dict()
+            for name, histogram in self.histograms.items()
+        }
+        data['cache_hits'] = self.cache_hits
+        data['cache_misses'] = self.cache_misses
+        data['page_cache'] = dict(self.page_cache)
+        return data
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view_name, request_metrics):
+        with self._lock:
+            self._views.setdefault(view_name, ViewMetrics()).add(
+                request_metrics)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view_name: metrics.as_dict()
+                for view_name, metrics in sorted(self._views.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
+
+
+class RequestMetrics:
+    """Счетчики одного запроса."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.wall_ms = 0
+        self.db_ms = 0
+        self.queries = 0
+        self.template_ms = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        # исход кэша страницы (см. posts.feed_cache.cached_page)
+        self.page_cache = None
+        # вложенные вызовы (include карточки в шаблоне страницы,
+        # get_many через get) не считаются второй раз
+        self.depth = {'template': 0, 'cache': 0}
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+        return self
+
+
+def current():
+    return getattr(_local, 'metrics', None)
+
+
+def page_cache(outcome):
+    metrics = current()
+    if metrics is not None:
+        metrics.page_cache = outcome
+
+
+@contextmanager
+def collect():
+    """Собирает метрики кода внутри блока в RequestMetrics."""
+    metrics = RequestMetrics()
+    previous, _local.metrics = current(), metrics
+    try:
+        yield metrics
+    finally:
+        _local.metrics = previous
+        metrics.finish()
+
+
+@contextmanager
+def _outermost(kind):
+    """Время самого внешнего вызова kind в мс, иначе None."""
+    metrics = current()
+    if metrics is None or metrics.depth[kind]:
+        if metrics is not None:
+            metrics.depth[kind] += 1
+        try:
+            yield None
+        finally:
+            if metrics is not None:
+                metrics.depth[kind] -= 1
+        return
+    timing = {}
+    metrics.depth[kind] += 1
+    started = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        metrics.depth[kind] -= 1
+        timing['ms'] = (time.perf_counter() - started) * 1000
+
+
+def db_wrapper(execute, sql, params, many, context):
+    """connection.execute_wrapper: число и время запросов к БД."""
+    metrics = current()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_ms += (time.perf_counter() - started) * 1000
+
+
+def timed_render(render):
+    """Обертка Template.render бэкенда шаблонов Django."""
+    def wrapper(self, *args, **kwargs):
+        with _outermost('template') as timing:
+            result = render(self, *args, **kwargs)
+        if timing is not None:
+            current().template_ms += timing['ms']
+        return result
+    wrapper.__wrapped__ = render
+    return wrapper
+
+
+def _count_get(get):
+    def wrapper(key, default=None, version=None):
+        with _outermost('cache') as timing:
+            value = get(key, _MISSING, version=version)
+        if timing is not None:
+            if value is _MISSING:
+                current().cache_misses += 1
+            else:
+                current().cache_hits += 1
+        return default if value is _MISSING else value
+    return wrapper
+
+
+def _count_get_many(get_many):
+    def wrapper(keys, version=None):
+        keys = list(keys)
+        with _outermost('cache') as timing:
+            values = get_many(keys, version=version)
+        if timing is not None:
+            current().cache_hits += len(values)
+            current().cache_misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def instrument_cache(backend):
+    """Считает попадания в кэш. Объекты бэкендов у каждого потока
+    свои (django.core.cache.caches), обертки ставятся на объект
+    один раз."""
+    if getattr(backend, '_metrics_instrumented', False):
+        return
+    backend.get = _count_get(backend.get)
+    backend.get_many = _count_get_many(backend.get_many)
+    backend._metrics_instrumented = True
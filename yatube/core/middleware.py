@@ -0,0 +1,106 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+
+from . import metrics, routers, staticfiles
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class PerformanceMiddleware:
+    """Метрики каждого запроса в core.metrics.registry под именем
+    представления (posts:index, posts:profile ...).
+
+    PERF_SLOW_REQUEST_MS - запросы дольше пишутся в лог;
+    PERF_QUERY_BUDGETS - {view_name: запросов к БД}, превышение
+    пишется в лог, а при PERF_ENFORCE_BUDGETS (в тестах) падает
+    с QueryBudgetExceeded.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        for alias in settings.CACHES:
+            metrics.instrument_cache(caches[alias])
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(metrics.db_wrapper))
+            request_metrics = stack.enter_context(metrics.collect())
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        metrics.registry.record(view_name, request_metrics)
+        self.check(request, view_name, request_metrics)
+        return response
+
+    def check(self, request, view_name, request_metrics):
+        slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', None)
+        if slow_ms is not None and request_metrics.wall_ms > slow_ms:
+            logger.warning(
+                'Медленный запрос %s %s (%s): %.0f мс, '
+                'БД %d запросов за %.0f мс, шаблоны %.0f мс',
+                request.method, request.path, view_name,
+                request_metrics.wall_ms, request_metrics.queries,
+                request_metrics.db_ms, request_metrics.template_ms
+            )
+        budget = getattr(settings, 'PERF_QUERY_BUDGETS', {}).get(view_name)
+        if budget is None or request_metrics.queries <= budget:
+            return
+        message = (
+            f'{view_name}: {request_metrics.queries} запросов к БД '
+            f'при бюджете {budget} ({request.path})'
+        )
+        if getattr(settings, 'PERF_ENFORCE_BUDGETS', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaPinMiddleware:
+    """После запроса с записью (пост, комментарий, подписка) ставит
+    куку routers.PIN_COOKIE на REPLICA_PIN_SECONDS: пока она есть,
+    запросы пользователя читают из основной базы и видят его
+    изменения, даже если реплика отстает."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset(pinned=routers.PIN_COOKIE in request.COOKIES)
+        try:
+            response = self.get_response(request)
+        finally:
+            written = routers.reset(pinned=True)
+        if written and routers.replicas():
+            response.set_cookie(
+                routers.PIN_COOKIE, '1', max_age=routers.pin_seconds(),
+                httponly=True, samesite='Lax')
+        return response
+
+
+class StaticFilesMiddleware:
+    """Отдает файлы STATIC_URL из STATIC_ROOT (после collectstatic)
+    сжатыми и с вечным кэшем, см. core.staticfiles. Стоит сразу после
+    SecurityMiddleware (редирект на HTTPS и заголовки безопасности
+    нужны и статике), но до сессий, пользователя и метрик."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        static_root, static_url = settings.STATIC_ROOT, settings.STATIC_URL
+        if (static_root and request.method in ('GET', 'HEAD')
+                and request.path_info.startswith(static_url)):
+            relative = request.path_info[len(static_url):]
+            path = staticfiles.find(static_root, relative)
+            if path is not None:
+                return staticfiles.serve(request, path, relative)
+        return self.get_response(request)
@@ -0,0 +1,196 @@
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+NEXT = 'n'
+PREVIOUS = 'p'
+# до этого порога COUNT(*) считается точно (с LIMIT) и живет в кэше
+# недолго, выше - считается один раз и дальше поддерживается сигналами
+COUNT_THRESHOLD: int = 1000
+COUNT_TIMEOUT: int = 60
+LARGE_COUNT_TIMEOUT: int = 60 * 60
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage(Page):
+    """Страница, полученная по курсору: номера страницы у неё нет,
+    поэтому соседние страницы определяются без COUNT(*)."""
+
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        super().__init__(object_list, None, paginator)
+        self._has_next = has_next
+        self._has_previous = has_previous
+
+    def __repr__(self):
+        return '<Page cursor>'
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+
+class CachedCountPaginator(Paginator):
+    """Если передан `count_key`, количество объектов берется
+    из кэша, а не из COUNT(*) на каждый запрос."""
+
+    def __init__(self, object_list, per_page, count_key=None,
+                 count_timeout=COUNT_TIMEOUT,
+                 count_threshold=COUNT_THRESHOLD, **kwargs):
+        self.count_key = count_key
+        self.count_timeout = count_timeout
+        self.count_threshold = count_threshold
+        super().__init__(object_list, per_page, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.count_key is None:
+            return super().count
+        count = cache.get(self.count_key)
+        if count is not None:
+            return count
+        # COUNT по подзапросу с LIMIT не просматривает больше порога
+        count = self.object_list[:self.count_threshold + 1].count()
+        timeout = self.count_timeout
+        if count > self.count_threshold:
+            # большие ленты показываем приблизительно: полный COUNT
+            # делается редко, а между пересчетами число правят сигналы
+            count = self.object_list.count()
+            timeout = LARGE_COUNT_TIMEOUT
+        cache.set(self.count_key, count, timeout)
+        return count
+
+
+class CursorPaginator(CachedCountPaginator):
+    """Паджинатор по ключу (keyset): вместо OFFSET страница выбирается
+    условием `(pub_date, id) < (последний пост предыдущей страницы)`.
+
+    Обычный `get_page(number)` продолжает работать для старых
+    ссылок вида `?page=N`.
+    """
+    ELLIPSIS = '…'
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id'),
+                 **kwargs):
+        self.keys = keys
+        object_list = object_list.order_by(*('-' + key for key in keys))
+        super().__init__(object_list, per_page, **kwargs)
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Окно номеров страниц вокруг текущей
+        (перенесено из Django 3.2)."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            yield from self.page_range
+            return
+        if number > (1 + on_each_side + on_ends) + 1:
+            yield from range(1, on_ends + 1)
+            yield self.ELLIPSIS
+            yield from range(number - on_each_side, number + 1)
+        else:
+            yield from range(1, number + 1)
+        if number < (self.num_pages - on_each_side - on_ends) - 1:
+            yield from range(number + 1, number + on_each_side + 1)
+            yield self.ELLIPSIS
+            yield from range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            yield from range(number + 1, self.num_pages + 1)
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, key) for key in self.keys]
+        # isoformat() целиком: DjangoJSONEncoder обрезает микросекунды,
+        # и курсор перестал бы совпадать с ключом поста
+        values = [
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in values
+        ]
+        payload = json.dumps([direction, values])
+        return urlsafe_base64_encode(force_bytes(payload))
+
+    def decode_cursor(self, cursor):
+        try:
+            direction, values = json.loads(urlsafe_base64_decode(cursor))
+            values = [
+                self._key_value(key, value)
+                for key, value in zip(self.keys, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(
+                self.keys) or None in values:
+            raise InvalidCursor(cursor)
+        return direction, values
+
+    def _key_value(self, key, value):
+        # ключом может быть и аннотация (например, релевантность
+        # поиска) - её значение приходит из JSON как есть
+        try:
+            field = self.object_list.model._meta.get_field(key)
+        except FieldDoesNotExist:
+            return value
+        return field.to_python(value)
+
+    def _keyset_filter(self, values, lookup):
+        """(a, b) < (x, y)  ->  a < x OR (a = x AND b < y)"""
+        condition = Q()
+        for i, key in enumerate(self.keys):
+            bound = {k: v for k, v in zip(self.keys[:i], values[:i])}
+            bound[f'{key}__{lookup}'] = values[i]
+            condition |= Q(**bound)
+        return condition
+
+    def cursor_page(self, cursor):
+        direction, values = self.decode_cursor(cursor)
+        if direction == NEXT:
+            objects = list(
+                self.object_list.filter(self._keyset_filter(values, 'lt'))
+                [:self.per_page + 1]
+            )
+            has_more = len(objects) > self.per_page
+            return CursorPage(
+                objects[:self.per_page], self, has_more, True)
+        objects = list(
+            self.object_list.reverse()
+            .filter(self._keyset_filter(values, 'gt'))[:self.per_page + 1]
+        )
+        has_more = len(objects) > self.per_page
+        objects = objects[:self.per_page][::-1]
+        return CursorPage(objects, self, True, has_more)
+
+    def first_page(self):
+        """Первая страница без COUNT(*): о следующей странице
+        говорит лишний объект в выборке."""
+        objects = list(self.object_list[:self.per_page + 1])
+        has_more = len(objects) > self.per_page
+        return CursorPage(objects[:self.per_page], self, has_more, False)
+
+    def get_cursor_page(self, cursor):
+        """Как `get_page`: битый курсор или пустая выборка
+        отдают первую страницу вместо ошибки."""
+        try:
+            page = self.cursor_page(cursor)
+        except InvalidCursor:
+            return self.get_page(1)
+        if not page.object_list:
+            return self.get_page(1)
+        return page
+
+
+def paginate(request, object_list, per_page, **kwargs):
+    """Страница для запроса: `?cursor=` - по курсору,
+    иначе совместимый режим с `?page=`."""
+    paginator = CursorPaginator(object_list, per_page, **kwargs)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        return paginator.get_cursor_page(cursor)
+    return paginator.get_page(request.GET.get('page'))
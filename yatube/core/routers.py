@@ -0,0 +1,73 @@
+"""Чтение с реплик, запись в основную базу.
+
+DATABASE_REPLICAS - алиасы реплик из DATABASES; пустой список -
+все идет в default. Реплика отстает от основной базы, поэтому
+пользователь, который только что что-то записал, еще
+REPLICA_PIN_SECONDS читает из основной (см. ReplicaPinMiddleware).
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# кука, по которой запросы пользователя после записи идут
+# в основную базу
+PIN_COOKIE = 'pin_primary'
+# на реплики идут только модели этих приложений: сессии
+# и пользователи читаются из основной базы
+REPLICA_APPS = {'posts'}
+
+_local = threading.local()
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+
+
+@contextmanager
+def use_primary():
+    """Чтение внутри блока - из основной базы."""
+    previous = getattr(_local, 'pinned', True)
+    _local.pinned = True
+    try:
+        yield
+    finally:
+        _local.pinned = previous
+
+
+def reset(pinned=True):
+    """Начало и конец запроса (см. core.middleware.ReplicaPinMiddleware).
+    Возвращает, было ли что-то записано с прошлого сброса."""
+    written = getattr(_local, 'written', False)
+    _local.pinned, _local.written = pinned, False
+    return written
+
+
+class ReplicaRouter:
+    """На реплики идут только чтения внутри запросов и только до
+    первой записи. Вне запросов (миграции, команды, shell) все
+    читается из основной базы: там важнее свежесть данных."""
+
+    def db_for_read(self, model, **hints):
+        if (not replicas() or getattr(_local, 'pinned', True)
+                or model._meta.app_label not in REPLICA_APPS):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas())
+
+    def db_for_write(self, model, **hints):
+        _local.pinned = _local.written = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики - копии основной базы, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # реплика получает схему вместе с данными
+        return db == DEFAULT_DB_ALIAS
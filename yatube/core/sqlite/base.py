@@ -0,0 +1,118 @@
+"""django.db.backends.sqlite3 для нескольких потоков и процессов.
+
+Каждое новое соединение получает прагмы из OPTIONS['pragmas']
+(WAL, synchronous, mmap_size, cache_size, busy_timeout...). Запрос
+вне транзакции, упавший с "database is locked", повторяется
+с экспоненциальной задержкой (OPTIONS['lock_retries'] раз).
+С OPTIONS['serialize_writes'] потоки процесса пишут в базу по
+очереди: транзакция начинается с BEGIN IMMEDIATE под общей для базы
+блокировкой, одиночные INSERT/UPDATE/DELETE идут под той же
+блокировкой. Так запись не упирается в busy_timeout и не падает,
+когда две транзакции, начавшие с чтения, пытаются перейти к записи.
+"""
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+# собственные ключи OPTIONS, в sqlite3.connect они не передаются
+BACKEND_OPTIONS = ('pragmas', 'serialize_writes', 'lock_retries')
+WRITE_STATEMENT = re.compile(
+    r'\s*(INSERT|UPDATE|DELETE|REPLACE)\b', re.IGNORECASE)
+# первая пауза перед повтором, секунды; дальше удваивается
+LOCK_BACKOFF: float = 0.01
+
+_write_locks = defaultdict(threading.RLock)
+_write_locks_guard = threading.Lock()
+
+
+def write_lock(name):
+    """Блокировка записи, общая для всех соединений процесса с базой
+    name."""
+    with _write_locks_guard:
+        return _write_locks[name]
+
+
+def is_lock_error(error):
+    return 'locked' in str(error)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = options.get('pragmas', {})
+        self.serialize_writes = options.get('serialize_writes', False)
+        self.lock_retries = options.get('lock_retries', 0)
+        self._write_lock = None
+        self.execute_wrappers.append(self._execute_with_retry)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in BACKEND_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if not self.serialize_writes:
+            return super()._start_transaction_under_autocommit()
+        lock = write_lock(self.settings_dict['NAME'])
+        lock.acquire()
+        self._write_lock = lock
+        try:
+            self.cursor().execute('BEGIN IMMEDIATE')
+        except Exception:
+            self._release_write_lock()
+            raise
+
+    def _release_write_lock(self):
+        if self._write_lock is not None:
+            lock, self._write_lock = self._write_lock, None
+            lock.release()
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self._release_write_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self._release_write_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self._release_write_lock()
+
+    def _execute_with_retry(self, execute, sql, params, many, context):
+        # внутри транзакции запрос не повторяется: ее целиком
+        # откатит atomic
+        if not self.autocommit:
+            return execute(sql, params, many, context)
+        lock = None
+        if self.serialize_writes and WRITE_STATEMENT.match(sql):
+            lock = write_lock(self.settings_dict['NAME'])
+        for attempt in range(self.lock_retries + 1):
+            try:
+                if lock is None:
+                    return execute(sql, params, many, context)
+                with lock:
+                    return execute(sql, params, many, context)
+            except OperationalError as error:
+                if attempt == self.lock_retries or not is_lock_error(error):
+                    raise
+            time.sleep(LOCK_BACKOFF * 2 ** attempt * random.uniform(0.5, 1.5))
@@ -0,0 +1,227 @@
+"""Кэш в файле SQLite (WAL), общий для всех процессов на хосте.
+
+LocMemCache у каждого воркера свой: страница, закэшированная одним
+воркером, не видна другим, а incr версии ленты (см. posts.feed_cache)
+не доходит до соседей. Здесь все воркеры работают с одним файлом,
+внешний сервис не нужен.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 10},
+    }}
+
+Срок жизни - по TIMEOUT, при переполнении удаляются сначала
+просроченные, затем давно не читавшиеся записи (приближенный LRU:
+время чтения обновляется не чаще раза в ACCESS_RESOLUTION секунд).
+Целые числа хранятся как INTEGER, поэтому incr атомарен - это один
+UPDATE.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL, accessed REAL'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+PRAGMAS = {
+    'journal_mode': 'wal',
+    # кэш можно потерять при сбое питания, fsync не нужен
+    'synchronous': 'off',
+    'busy_timeout': 5000,
+    'mmap_size': 64 * 1024 * 1024,
+}
+# NULL в expires - без срока
+ALIVE = '(expires IS NULL OR expires > ?)'
+REPLACE = 'INSERT OR REPLACE INTO cache'
+ACCESS_RESOLUTION: float = 10
+# проверять переполнение раз в столько записей (в каждом потоке)
+CULL_CHECK_EVERY: int = 100
+# SQLITE_MAX_VARIABLE_NUMBER в старых сборках
+MAX_PARAMS: int = 999
+
+
+def encode(value):
+    # bool - тоже int, но после incr должен остаться bool
+    if type(value) is int:
+        return value
+    return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+
+def decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.location = location
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        """Соединение своего потока; после fork - новое."""
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self.location)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.location, isolation_level=None)
+            for name, value in PRAGMAS.items():
+                db.execute(f'PRAGMA {name} = {value}')
+            for statement in SCHEMA:
+                db.execute(statement)
+            local.db, local.pid, local.writes = db, os.getpid(), 0
+        return local.db
+
+    @contextmanager
+    def transaction(self):
+        # IMMEDIATE: блокировка записи берется сразу, а не при
+        # переходе от чтения к записи, где SQLite не ждет busy_timeout
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        now = time.time()
+        found, stale = {}, []
+        names = list(keys)
+        for start in range(0, len(names), MAX_PARAMS - 1):
+            chunk = names[start:start + MAX_PARAMS - 1]
+            rows = self.db.execute(
+                f'SELECT key, value, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))}) '
+                f'AND {ALIVE}', [*chunk, now])
+            for name, value, accessed in rows:
+                found[keys[name]] = decode(value)
+                if now - accessed > ACCESS_RESOLUTION:
+                    stale.append((now, name))
+        if stale:
+            self.db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version=version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires, now = self.get_backend_timeout(timeout), time.time()
+        rows = [
+            (self._key(key, version), encode(value), expires, now)
+            for key, value in data.items()
+        ]
+        if len(rows) == 1:
+            self.db.execute(f'{REPLACE} VALUES (?, ?, ?, ?)', rows[0])
+        else:
+            with self.transaction() as db:
+                db.executemany(f'{REPLACE} VALUES (?, ?, ?, ?)', rows)
+        self._maybe_cull(len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        """Запись, только если ключа нет или он просрочен."""
+        now = time.time()
+        cursor = self.db.execute(
+            'INSERT INTO cache VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET value = excluded.value, '
+            'expires = excluded.expires, accessed = excluded.accessed '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self._key(key, version), encode(value),
+             self.get_backend_timeout(timeout), now, now))
+        added = cursor.rowcount > 0
+        if added:
+            self._maybe_cull(1)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        value = None
+        with self.transaction() as db:
+            cursor = db.execute(
+                f'UPDATE cache SET value = value + ? WHERE key = ? '
+                f"AND typeof(value) = 'integer' AND {ALIVE}",
+                (delta, key, time.time()))
+            if cursor.rowcount:
+                value = db.execute(
+                    'SELECT value FROM cache WHERE key = ?', (key,)
+                ).fetchone()[0]
+        if value is None:
+            raise ValueError(f"Key '{key}' not found")
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self.db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {ALIVE}',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()))
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        return self.db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {ALIVE}',
+            (self._key(key, version), time.time())
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        names = [self._key(key, version) for key in keys]
+        for start in range(0, len(names), MAX_PARAMS):
+            chunk = names[start:start + MAX_PARAMS]
+            self.db.execute(
+                f'DELETE FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, written):
+        local = self._local
+        local.writes += written
+        if local.writes < CULL_CHECK_EVERY:
+            return
+        local.writes = 0
+        self.cull()
+
+    def cull(self):
+        """Сначала просроченные, затем 1/CULL_FREQUENCY давно
+        не читавшихся записей."""
+        db = self.db
+        db.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        db.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY accessed LIMIT ?)',
+            (count // self._cull_frequency,))
@@ -0,0 +1,228 @@
+"""Статика с хешами в именах, заранее сжатая, отдается самим Django.
+
+collectstatic с CompressedManifestStorage кладет в STATIC_ROOT копии
+с хешем содержимого в имени (css/bootstrap.min.3f2a....css) и рядом
+их сжатые варианты .gz и .br (brotli - если установлен пакет brotli).
+Шаблоны через {% static %} ссылаются на имена с хешем, поэтому такие
+файлы можно кэшировать в браузере навсегда: новое содержимое - новое
+имя.
+
+core.middleware.StaticFilesMiddleware отдает файлы из STATIC_ROOT
+без веб-сервера перед приложением: выбирает вариант по
+Accept-Encoding, поддерживает Range и отдает FileResponse - WSGI
+сервер с wsgi.file_wrapper (gunicorn, uWSGI) шлет его через
+sendfile, без копирования в Python.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from collections import OrderedDict
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# расширения, которые стоит сжимать: картинки уже сжаты
+COMPRESSIBLE = ('.css', '.js', '.svg', '.txt', '.html', '.json', '.map',
+                '.xml', '.ico')
+# сжатый вариант, который не меньше хотя бы на 5%, не нужен
+MIN_RATIO: float = 0.95
+# Content-Encoding: суффикс файла, в порядке предпочтения
+ENCODINGS = OrderedDict((('br', '.br'), ('gzip', '.gz')))
+IMMUTABLE_MAX_AGE: int = 365 * 24 * 60 * 60
+# для файлов без хеша (например, при запуске без манифеста)
+MAX_AGE: int = 60
+HASHED = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0 - одинаковый результат при каждой сборке
+        return gzip.compress(data, 9, mtime=0)
+    return brotli.compress(data)
+
+
+class CompressedManifestStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage, которая после подстановки хешей
+    сохраняет сжатые варианты файлов."""
+
+    def post_process(self, *args, **kwargs):
+        # css проходит подстановку хешей несколько раз, сжимаем
+        # только окончательные имена
+        final = {}
+        for name, hashed_name, processed in super().post_process(
+                *args, **kwargs):
+            if not isinstance(processed, Exception) and hashed_name:
+                final[name] = hashed_name
+            yield name, hashed_name, processed
+        for hashed_name in final.values():
+            if hashed_name.endswith(COMPRESSIBLE):
+                self.save_compressed(hashed_name)
+
+    def save_compressed(self, name):
+        with self.open(name) as original:
+            data = original.read()
+        for encoding, suffix in ENCODINGS.items():
+            if encoding == 'br' and brotli is None:
+                continue
+            compressed = compress(data, encoding)
+            if len(compressed) >= len(data) * MIN_RATIO:
+                continue
+            # пишем напрямую: _save добавил бы к занятому имени суффикс
+            with open(self.path(name) + suffix, 'wb') as output:
+                output.write(compressed)
+
+    def stored_name(self, name):
+        # имени нет в манифесте, если не запускали collectstatic
+        # (разработка, тесты) или файла нет вовсе: ссылка без хеша
+        # вместо ошибки 500 на всей странице
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding, кроме явно запрещенных q=0."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip().replace(' ', '')
+        if quality.startswith('q=') and not quality[2:].strip('0.'):
+            continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+def find(static_root, relative):
+    """Путь файла в STATIC_ROOT или None; выход за каталог - None.
+    Сжатые варианты (.gz, .br) напрямую не отдаются: без
+    Content-Encoding браузер получил бы сжатые байты как есть."""
+    if relative.endswith(tuple(ENCODINGS.values())):
+        return None
+    try:
+        path = safe_join(static_root, relative)
+    except SuspiciousFileOperation:
+        return None
+    return path if os.path.isfile(path) else None
+
+
+def cache_headers(response, relative, mtime):
+    if HASHED.search(relative):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable')
+    else:
+        response['Cache-Control'] = f'public, max-age={MAX_AGE}'
+    response['Last-Modified'] = http_date(mtime)
+
+
+def parse_range(header, size):
+    """(start, end) включительно для одного диапазона; None - отдать
+    файл целиком; ValueError - диапазон вне файла."""
+    match = RANGE.match(header.strip())
+    if match is None:
+        # несколько диапазонов (multipart) не поддерживаем
+        return None
+    start, end = match.groups()
+    if not start:
+        if not end:
+            return None
+        # bytes=-N - последние N байт
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+class FileRange:
+    """Файл, читаемый только до конца диапазона. Без fileno: сервер
+    отдаст его чтением, а не sendfile на весь остаток файла."""
+
+    def __init__(self, file, length):
+        self.file, self.remaining = file, length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def pick_variant(request, path, variants):
+    """(Content-Encoding или None, путь файла) для клиента."""
+    accepted = accepted_encodings(
+        request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    for encoding, variant in variants:
+        if encoding in accepted or '*' in accepted:
+            return encoding, variant
+    return None, path
+
+
+def serve(request, path, relative):
+    """Ответ на GET/HEAD файла статики path (относительно
+    STATIC_ROOT - relative)."""
+    stat = os.stat(path)
+    if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime, stat.st_size):
+        response = HttpResponseNotModified()
+        cache_headers(response, relative, stat.st_mtime)
+        return response
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    variants = [
+        (encoding, path + suffix) for encoding, suffix in ENCODINGS.items()
+        if os.path.isfile(path + suffix)
+    ]
+    header = request.META.get('HTTP_RANGE')
+    if header:
+        response = serve_range(path, stat.st_size, header, content_type)
+    else:
+        encoding, variant = pick_variant(request, path, variants)
+        response = FileResponse(
+            open(variant, 'rb'), content_type=content_type)
+        if encoding:
+            response['Content-Encoding'] = encoding
+    if variants:
+        response['Vary'] = 'Accept-Encoding'
+    response['Accept-Ranges'] = 'bytes'
+    cache_headers(response, relative, stat.st_mtime)
+    return response
+
+
+def serve_range(path, size, header, content_type):
+    """Диапазон - всегда от несжатого файла."""
+    try:
+        byte_range = parse_range(header, size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    file = open(path, 'rb')
+    if byte_range is None:
+        return FileResponse(file, content_type=content_type)
+    start, end = byte_range
+    file.seek(start)
+    length = end - start + 1
+    if end < size - 1:
+        file = FileRange(file, length)
+    response = FileResponse(file, content_type=content_type, status=206)
+    response['Content-Length'] = length
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,69 @@
+"""Потоковая выдача страницы, которую не кэширует posts.feed_cache
+(поиск).
+
+render() отдает страницу, только когда выполнены все запросы и
+отрендерены все карточки. stream_render сначала отдает начало
+страницы (head, шапку, форму) - до первого запроса к постам: страница
+в контексте ленивая (SimpleLazyObject) и вычисляется уже в генераторе
+ответа. Дальше идут карточки пачками по STREAM_BATCH по мере чтения
+строк курсором (.iterator()), затем footer_template (паджинатор)
+и конец страницы.
+
+Шаблон страницы не должен обращаться к page_obj вне {{ stream }},
+иначе запросы выполнятся до первого байта. Запросы генератора идут
+после middleware, поэтому не попадают в бюджет запросов вида.
+"""
+from itertools import islice
+
+from django.db.models import QuerySet
+from django.http import StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .templatetags.card_tags import cached_cards
+
+SLOT = mark_safe('<!--stream-->')
+STREAM_BATCH: int = 5
+
+
+def page_batches(page, size):
+    """Объекты страницы пачками. Непрочитанный queryset читается
+    курсором; прочитанное остается в page.object_list - по первому
+    и последнему объекту паджинатор строит курсоры без нового
+    запроса."""
+    items = page.object_list
+    if isinstance(items, QuerySet) and items._result_cache is None:
+        items = items.iterator(chunk_size=size)
+    items = iter(items)
+    seen = []
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            break
+        seen += batch
+        yield batch
+    page.object_list = seen
+
+
+def stream_render(request, template_name, context, card_template,
+                  footer_template, separator='<hr>'):
+    """Как render(), но на место {{ stream }} потоком выводятся
+    карточки context['page_obj'] (шаблон card_template, см.
+    card_tags.cached_cards) и footer_template с тем же контекстом.
+    Контекст шаблона страницы доступен тестовому клиенту как обычно."""
+    html = render_to_string(
+        template_name, {**context, 'stream': SLOT}, request)
+    head, _, tail = html.partition(SLOT)
+
+    def content():
+        yield head
+        page = context.get('page_obj')
+        if page is not None:
+            first = True
+            for batch in page_batches(page, STREAM_BATCH):
+                for card in cached_cards(batch, card_template):
+                    yield card if first else separator + card
+                    first = False
+        yield render_to_string(footer_template, context, request)
+        yield tail
+    return StreamingHttpResponse(content())
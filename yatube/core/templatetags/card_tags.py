@@ -0,0 +1,39 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import get_template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CARD_TIMEOUT: int = 60 * 60 * 24
+
+
+def card_key(template_name, obj):
+    """Ключ карточки: объект и время его последнего изменения,
+    поэтому правка объекта сама делает старую карточку ненужной."""
+    return (
+        f'card:{template_name}:{obj._meta.label_lower}:{obj.pk}:'
+        f'{obj.updated_at.timestamp()}'
+    )
+
+
+@register.simple_tag
+def cached_cards(objects, template_name):
+    """Карточки объектов одним get_many из кэша: недостающие
+    рендерятся шаблоном template_name и сохраняются одним set_many.
+    В шаблоне карточки объект доступен по имени модели (post).
+
+    {% cached_cards page_obj 'includes/posts_details.html' as cards %}
+    {% for card in cards %}{{ card }}{% endfor %}
+    """
+    cards = {card_key(template_name, obj): obj for obj in objects}
+    rendered = cache.get_many(cards)
+    if len(rendered) < len(cards):
+        card_template = get_template(template_name)
+        missing = {
+            key: card_template.render({obj._meta.model_name: obj})
+            for key, obj in cards.items() if key not in rendered
+        }
+        cache.set_many(missing, CARD_TIMEOUT)
+        rendered.update(missing)
+    return [mark_safe(rendered[key]) for key in cards]
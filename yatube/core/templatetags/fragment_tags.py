@@ -0,0 +1,51 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import fragments
+
+register = template.Library()
+
+
+class FragmentNode(template.Node):
+    def __init__(self, name, args, nodelist):
+        self.name, self.args, self.nodelist = name, args, nodelist
+
+    def render(self, context):
+        request = context['request']
+        name = self.name.resolve(context)
+        args = [arg.resolve(context) for arg in self.args]
+        if fragments.is_shared(request):
+            return fragments.block_marker(
+                name, args, self.nodelist.render(context))
+        if fragments.check(request, name, args):
+            return self.nodelist.render(context)
+        return ''
+
+
+@register.tag
+def fragment(parser, token):
+    """Блок, который виден, только если выполнено условие
+    (см. core.fragments):
+
+    {% fragment 'author' post.author_id %}...{% endfragment %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            "'fragment' принимает имя условия и его аргументы")
+    nodelist = parser.parse(('endfragment',))
+    parser.delete_first_token()
+    return FragmentNode(
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+        nodelist
+    )
+
+
+@register.simple_tag(takes_context=True)
+def fragment_value(context, name):
+    """Значение текущего пользователя: {% fragment_value 'username' %}."""
+    request = context['request']
+    if fragments.is_shared(request):
+        return mark_safe(fragments.value_marker(name))
+    return fragments.get_value(request, name)
@@ -0,0 +1,24 @@
+from django import template
+
+from core.paginators import NEXT, PREVIOUS
+
+register = template.Library()
+
+
+@register.filter
+def next_cursor(page):
+    if not page.has_next():
+        return ''
+    return page.paginator.encode_cursor(page[len(page) - 1], NEXT)
+
+
+@register.filter
+def previous_cursor(page):
+    if not page.has_previous():
+        return ''
+    return page.paginator.encode_cursor(page[0], PREVIOUS)
+
+
+@register.filter
+def page_window(page):
+    return page.paginator.get_elided_page_range(page.number)
@@ -1,6 +1,10 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
 from django.shortcuts import render
 from http import HTTPStatus
 
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     # Переменная exception содержит отладочную информацию;
@@ -19,3 +23,10 @@ def server_error(request, reason=''):
 
 def permission_denied(request, reason=''):
     return render(request, 'core/403.html')
+
+
+@staff_member_required
+def perf_metrics(request):
+    """Гистограммы core.metrics этого процесса по представлениям."""
+    return JsonResponse(
+        registry.snapshot(), json_dumps_params={'ensure_ascii': False})
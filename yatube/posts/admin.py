@@ -1,6 +1,29 @@
+import hashlib
+from collections import Counter
+from functools import partial
+
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
+from django.utils import timezone
+
+from core.paginators import CachedCountPaginator
+from .counters import (AUTHOR, FOLLOW, GROUP, INDEX, adjust_feed_counts,
+                       feed_count_key)
+from .feed_cache import POPULAR, POST, bump_feeds, group_choices
+from .models import Post, Group, TimelineEntry
+
+
+class GroupActionForm(ActionForm):
+    group = forms.ModelChoiceField(
+        Group.objects.all(), required=False, label='Группа',
+        empty_label='без группы'
+    )
 
-from .models import Post, Group
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].choices = (
+            [('', 'без группы')] + group_choices())
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,14 +34,96 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    # годы и месяцы берутся из индекса post_date_idx
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    action_form = GroupActionForm
+    actions = ('move_to_group',)
+    # без второго COUNT(*) по всей таблице на каждый фильтр
+    show_full_result_count = False
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # поиск по FTS5-индексу вместо LIKE '%...%' (см. posts.search)
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        # количество постов берется из кэша: без фильтров - то же,
+        # что у главной (его правят сигналы), иначе - по тексту запроса
+        if queryset.query.where:
+            query_hash = hashlib.md5(
+                str(queryset.query).encode()).hexdigest()
+            count_key = f'admin_count:post:{query_hash}'
+        else:
+            count_key = feed_count_key(INDEX)
+        return CachedCountPaginator(
+            queryset, per_page, count_key=count_key, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page
+        )
+
+    def get_changelist_formset(self, request, **kwargs):
+        kwargs['formfield_callback'] = partial(
+            self.changelist_formfield, request=request)
+        return super().get_changelist_formset(request, **kwargs)
+
+    def changelist_formfield(self, db_field, request, **kwargs):
+        """В списке постов группа - обычный <select> с готовыми
+        вариантами из кэша, а не autocomplete с запросом на строку."""
+        if db_field.name != 'group':
+            return self.formfield_for_dbfield(db_field, request, **kwargs)
+        field = db_field.formfield(**kwargs)
+        field.choices = [('', field.empty_label)] + group_choices()
+        return field
+
+    def move_to_group(self, request, queryset):
+        """Переносит выбранные посты в группу одним UPDATE. Сигналы
+        при update() не приходят, поэтому счетчики и версии лент
+        правятся здесь."""
+        form = self.action_form(request.POST)
+        form.fields['action'].choices = self.get_action_choices(request)
+        group = form.cleaned_data['group'] if form.is_valid() else None
+        group_id = group.pk if group else None
+        rows = list(queryset.values_list('pk', 'author_id', 'group_id'))
+        moved = queryset.update(group_id=group_id, updated_at=timezone.now())
+        old_groups = Counter(old for _, _, old in rows if old != group_id)
+        for old_group_id, count in old_groups.items():
+            if old_group_id is not None:
+                adjust_feed_counts(
+                    [feed_count_key(GROUP, old_group_id)], -count)
+        if group_id is not None:
+            adjust_feed_counts(
+                [feed_count_key(GROUP, group_id)],
+                sum(old_groups.values()))
+        authors = {author_id for _, author_id, _ in rows}
+        feeds = {(INDEX, None)}
+        feeds |= {(GROUP, pk) for pk in set(old_groups) | {group_id}
+                  if pk is not None}
+        feeds |= {(AUTHOR, author_id) for author_id in authors}
+        feeds |= {(POST, pk) for pk, _, _ in rows}
+        for author_id in authors:
+            readers = TimelineEntry.objects.readers(author_id)
+            if readers is None:
+                feeds.add((POPULAR, None))
+            else:
+                feeds |= {(FOLLOW, user_id) for user_id in readers}
+        bump_feeds(feeds)
+        self.message_user(
+            request, f'Перенесено постов: {moved} в «{group or "без группы"}»')
+    move_to_group.short_description = 'Перенести в группу'
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('title', 'slug', 'description')
+    # нужен для autocomplete_fields у постов
+    search_fields = ('title', 'slug')
+    show_full_result_count = False
 
 
 admin.site.register(Post, PostAdmin)
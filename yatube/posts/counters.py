@@ -0,0 +1,29 @@
+from django.core.cache import cache
+
+INDEX = 'index'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOW = 'follow'
+
+
+def feed_count_key(feed, pk=None):
+    """Ключ кэша с количеством постов в ленте."""
+    if pk is None:
+        return f'feed_count:{feed}'
+    return f'feed_count:{feed}:{pk}'
+
+
+def post_count_keys(author_id, group_id):
+    keys = [feed_count_key(INDEX), feed_count_key(AUTHOR, author_id)]
+    if group_id is not None:
+        keys.append(feed_count_key(GROUP, group_id))
+    return keys
+
+
+def adjust_feed_counts(keys, delta):
+    for key in keys:
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # счетчика в кэше нет - его посчитает паджинатор
+            pass
@@ -0,0 +1,271 @@
+import hashlib
+import random
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import (add_never_cache_headers,
+                                get_conditional_response,
+                                patch_cache_control, patch_response_headers,
+                                patch_vary_headers)
+from django.utils.http import quote_etag
+
+from core import fragments, metrics
+from core.routers import pin_seconds, use_primary
+
+from .models import Group
+
+POST = 'post'
+# общая версия для лент подписок на популярных авторов:
+# их посты не раскладываются по лентам, поэтому и версии
+# каждого подписчика при публикации не трогаются
+POPULAR = 'popular'
+FEED_CACHE_TIMEOUT: int = 5 * 60
+# сколько после мягкого срока можно отдавать прежнюю копию той же
+# версии, пока другой воркер строит новую
+STALE_TIMEOUT: int = 5 * 60
+# разброс мягкого срока, чтобы страницы не истекали разом
+TIMEOUT_JITTER: float = 0.1
+# блокировка перестройки страницы: дольше любого рендеринга, чтобы
+# упавший воркер не держал ее вечно
+REBUILD_LOCK_TIMEOUT: int = 10
+# без копии этой версии столько ждем чужую перестройку
+REBUILD_WAIT: float = 2.0
+REBUILD_POLL: float = 0.02
+# запасной срок: записи сбрасывают сигналы (см. posts.signals)
+LOOKUP_TIMEOUT: int = 24 * 60 * 60
+# выбор группы в админке: один запрос на все строки списка постов
+GROUP_CHOICES_KEY = 'admin:group_choices'
+GROUP_CHOICES_TIMEOUT: int = 60 * 60
+
+
+def version_key(feed, pk=None):
+    if pk is None:
+        return f'feed_version:{feed}'
+    return f'feed_version:{feed}:{pk}'
+
+
+def modified_key(feed, pk=None):
+    return 'feed_modified:' + version_key(feed, pk).split(':', 1)[1]
+
+
+def feed_state(feeds):
+    """Текущие версии лент [(feed, pk), ...] и время (в секундах)
+    последнего изменения любой из них - одним get_many. Пропавшие из
+    кэша значения заводятся заново от текущего времени: версия не
+    совпадет со старой, а страница построится по основной базе."""
+    version_keys = [version_key(*feed) for feed in feeds]
+    modified_keys = [modified_key(*feed) for feed in feeds]
+    stored = cache.get_many(version_keys + modified_keys)
+    now = time.time_ns()
+    for key in version_keys:
+        if key not in stored:
+            stored[key] = now
+            cache.add(key, now, None)
+    for key in modified_keys:
+        if key not in stored:
+            stored[key] = now // 10 ** 9
+            cache.add(key, stored[key], None)
+    return (
+        [stored[key] for key in version_keys],
+        max(stored[key] for key in modified_keys)
+    )
+
+
+def bump_feeds(feeds):
+    for feed in feeds:
+        try:
+            cache.incr(version_key(*feed))
+        except ValueError:
+            # версии нет - при чтении заведется новая
+            pass
+    modified = int(time.time())
+    cache.set_many(
+        {modified_key(*feed): modified for feed in feeds}, None)
+
+
+def lookup_key(model, field, **filters):
+    # slug и username - не ASCII и с пробелами: для memcached ключ
+    # из них не годится, поэтому, как в page_key, - md5
+    lookup = ':'.join(f'{name}={value}' for name, value in filters.items())
+    digest = hashlib.md5(lookup.encode()).hexdigest()
+    return f'lookup:{model._meta.label_lower}:{field}:{digest}'
+
+
+def cached_lookup(model, field, **filters):
+    """Значение поля (например, id по username) из кэша, чтобы ключ
+    страницы строился без запросов к БД. Переименование и удаление
+    сбрасывают запись (forget_lookups в posts.signals)."""
+    key = lookup_key(model, field, **filters)
+    value = cache.get(key)
+    if value is None:
+        value = model.objects.filter(**filters).values_list(
+            field, flat=True).first()
+        if value is not None:
+            cache.set(key, value, LOOKUP_TIMEOUT)
+    return value
+
+
+def group_choices():
+    """[(pk, title), ...] всех групп из кэша, ключ сбрасывает
+    forget_group_choices при изменении групп (см. posts.signals)."""
+    return cache.get_or_set(
+        GROUP_CHOICES_KEY,
+        lambda: list(Group.objects.order_by('title').values_list(
+            'pk', 'title')),
+        GROUP_CHOICES_TIMEOUT
+    )
+
+
+def forget_group_choices():
+    cache.delete(GROUP_CHOICES_KEY)
+
+
+def cache_feed(feeds, timeout=FEED_CACHE_TIMEOUT, shared=True):
+    """Кэш страницы (см. cached_page) с версиями лент, которые она
+    показывает: изменение поста, комментария или подписки поднимает
+    версию (см. posts.signals), и страница перестраивается сразу,
+    а не по таймауту. Из тех же версий строится ETag для условных GET.
+    Last-Modified не отдается: время изменения ленты общее для всех
+    зрителей, а части страницы зависят от пользователя, и с точностью
+    до секунды правка могла совпасть со временем копии браузера.
+
+    Страница рендерится одна на всех (core.fragments.shared_render),
+    части пользователя подставляются при каждой выдаче. shared=False -
+    своя копия на каждую сессию, если от пользователя зависит сама
+    страница (лента подписок).
+
+    feeds(request, *args, **kwargs) возвращает список (feed, pk)
+    или None, если страницу кэшировать не нужно (например, 404).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            page_feeds = feeds(request, *args, **kwargs)
+            if page_feeds is None:
+                return view(request, *args, **kwargs)
+            versions, modified = feed_state(page_feeds)
+            prefix = 'feed:' + '.'.join(str(version) for version in versions)
+            # страница зависит и от пользователя, поэтому в ETag -
+            # кука сессии (вход и выход ее меняют); остальные куки,
+            # например csrftoken, выставленная первым ответом,
+            # страницу не меняют
+            session = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+            etag = quote_etag(hashlib.md5(
+                f'{prefix}:{session}'.encode()).hexdigest())
+            headers = HttpResponse()
+            revalidate_headers(headers, etag)
+            # повторный визит без изменений - 304 (или 412) без
+            # рендеринга и запросов к БД; если условия выполнены,
+            # возвращается переданный headers
+            conditional = get_conditional_response(
+                request, etag=etag, response=headers)
+            if conditional is not headers:
+                return conditional
+            # лента только что изменилась, а реплика может отставать:
+            # страницу под новой версией строим по основной базе,
+            # иначе устаревшая копия закэшируется на весь таймаут
+            request.page_shared = shared
+            with ExitStack() as stack:
+                stack.enter_context(fragments.shared_render(request))
+                if time.time() - modified < pin_seconds():
+                    stack.enter_context(use_primary())
+                response = cached_page(
+                    request, view, args, kwargs, prefix, timeout)
+            fragments.fill(request, response)
+            # старая копия не должна получить ETag новой версии,
+            # иначе браузер будет получать на нее 304
+            if response.status_code == 200 and not getattr(
+                    response, 'stale', False):
+                revalidate_headers(response, etag)
+            else:
+                add_never_cache_headers(response)
+            return response
+        return wrapper
+    return decorator
+
+
+def revalidate_headers(response, etag):
+    """Браузер может хранить страницу, но перед показом обязан
+    свериться с сервером: об изменениях сервер узнает сразу,
+    а браузер по таймауту - нет."""
+    # Expires от cache_page обещает свежесть на весь таймаут
+    del response['Expires']
+    patch_response_headers(response, cache_timeout=0)
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    response['ETag'] = etag
+
+
+def page_key(request):
+    # общая страница - одна на всех; иначе своя копия на сессию
+    raw = request.get_full_path()
+    if not getattr(request, 'page_shared', True):
+        raw += ':' + request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    return 'page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def cacheable(request, response):
+    # как UpdateCacheMiddleware: куку, выданную запросу без кук,
+    # нельзя раздавать другим
+    return (
+        response.status_code == 200 and not response.streaming
+        and not (response.cookies and not request.COOKIES)
+    )
+
+
+def rebuild(request, view, args, kwargs, key, prefix, timeout):
+    response = view(request, *args, **kwargs)
+    if cacheable(request, response):
+        fresh_until = time.time() + timeout * random.uniform(
+            1 - TIMEOUT_JITTER, 1 + TIMEOUT_JITTER)
+        cache.set(
+            key, (prefix, fresh_until, response), timeout + STALE_TIMEOUT)
+    return response
+
+
+def cached_page(request, view, args, kwargs, prefix, timeout):
+    """Замена cache_page без лавины промахов: страницу перестраивает
+    один запрос (блокировка через cache.add), остальные в это время
+    отдают прежнюю копию той же версии лент (истек только мягкий
+    срок), а если ее нет - ждут готовую. Запись в кэше:
+    (prefix версий, мягкий срок, ответ); жесткий срок - на
+    STALE_TIMEOUT позже мягкого. Исход пишется в метрики запроса
+    (core.metrics): hit, rebuilt, stale, coalesced, wait_timeout."""
+    if request.method not in ('GET', 'HEAD'):
+        return view(request, *args, **kwargs)
+    key = page_key(request)
+    entry = cache.get(key)
+    # копия другой версии ленты (после записи) не отдается никогда:
+    # автор поста или комментария должен увидеть свое изменение
+    if entry is not None and entry[0] != prefix:
+        entry = None
+    if entry is not None and time.time() < entry[1]:
+        metrics.page_cache('hit')
+        return entry[2]
+    lock_key = key + ':lock'
+    if cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+        try:
+            metrics.page_cache('rebuilt')
+            return rebuild(request, view, args, kwargs, key, prefix, timeout)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        # истек только мягкий срок, а страницу уже перестраивает
+        # другой запрос
+        metrics.page_cache('stale')
+        response = entry[2]
+        response.stale = True
+        return response
+    deadline = time.time() + REBUILD_WAIT
+    while time.time() < deadline:
+        time.sleep(REBUILD_POLL)
+        entry = cache.get(key)
+        if entry is not None and entry[0] == prefix:
+            metrics.page_cache('coalesced')
+            return entry[2]
+    metrics.page_cache('wait_timeout')
+    return rebuild(request, view, args, kwargs, key, prefix, timeout)
@@ -1,6 +1,8 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
 from .models import Post, Comment
+from .uploads import ingest_image
 
 
 class PostForm(forms.ModelForm):
@@ -16,6 +18,16 @@ class PostForm(forms.ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # новый файл проходит через posts.uploads, прежняя картинка
+        # при редактировании приходит как есть
+        if isinstance(image, UploadedFile):
+            image, self.instance.image_hash = ingest_image(image)
+        elif not image:
+            self.instance.image_hash = ''
+        return image
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
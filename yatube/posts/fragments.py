@@ -0,0 +1,37 @@
+"""Условия блоков общих страниц (см. core.fragments), зависящие
+от постов и подписок."""
+from core.fragments import condition
+
+from .models import Follow
+
+
+def is_author(request, author_id):
+    return str(request.user.pk) == author_id
+
+
+def follows(request, author_id):
+    # кнопка проверяет оба условия - один запрос на страницу
+    cached = getattr(request, 'follows', None)
+    if cached is None:
+        cached = request.follows = {}
+    if author_id not in cached:
+        cached[author_id] = request.user.is_authenticated and (
+            Follow.objects.filter(
+                user=request.user, author_id=author_id).exists())
+    return cached[author_id]
+
+
+@condition('author')
+def author(request, author_id):
+    return is_author(request, author_id)
+
+
+@condition('following')
+def following(request, author_id):
+    return not is_author(request, author_id) and follows(request, author_id)
+
+
+@condition('not_following')
+def not_following(request, author_id):
+    # аноним тоже видит "Подписаться": после входа подпишется
+    return not (is_author(request, author_id) or follows(request, author_id))
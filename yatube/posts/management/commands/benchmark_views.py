@@ -0,0 +1,264 @@
+"""Замеры представлений на синтетических данных разного объема.
+
+Для каждого размера создается отдельная тестовая база, заполняется
+seed_yatube и прогоняется тестовым клиентом: задержка (p50/p95/p99),
+число запросов к БД и пик памяти на запрос. Итог пишется в JSON,
+с --compare сравнивается с прошлым прогоном.
+
+    python manage.py benchmark_views --sizes 1000 100000 \\
+        --output bench.json --compare baseline.json
+"""
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post
+
+User = get_user_model()
+
+SIZES = (1000, 10000, 100000, 1000000)
+PERCENTILES = (50, 95, 99)
+# разница меньше этого порога - шум, а не регрессия
+NOISE_MS: float = 1.0
+
+
+def dataset(posts):
+    """Параметры seed_yatube для заданного числа постов."""
+    users = max(50, posts // 20)
+    return {
+        'users': users,
+        'groups': max(5, posts // 5000),
+        'posts': posts,
+        'comments': posts * 2,
+        'follows': users * 5,
+    }
+
+
+def bench_caches(directory):
+    """CACHES как у сайта, но в своем месте: файл SQLite или
+    каталог во временном directory, для locmem - отдельное имя."""
+    default = settings.CACHES['default']
+    location = directory
+    if default['BACKEND'] == 'core.sqlite_cache.SQLiteCache':
+        location = os.path.join(directory, 'cache.sqlite3')
+    return {'default': {**default, 'LOCATION': location}}
+
+
+def percentile(values, percent):
+    """Ближайший ранг по отсортированному списку."""
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[rank - 1]
+
+
+def pick_targets():
+    """Самые нагруженные объекты: у них длиннее всего ленты
+    и больше всего комментариев."""
+    author = User.objects.annotate(total=Count('posts')).latest('total')
+    reader = User.objects.annotate(
+        total=Count('follower')).latest('total')
+    followed = Follow.objects.filter(user=reader).values('author')
+    return {
+        'author': author,
+        'group': Group.objects.annotate(
+            total=Count('posts')).latest('total'),
+        'post': Post.objects.latest('comment_count'),
+        'reader': reader,
+        'to_follow': list(
+            User.objects.exclude(pk__in=followed).exclude(pk=reader.pk)
+            .order_by('-pk').values_list('username', flat=True)),
+    }
+
+
+def scenarios(targets):
+    """{имя представления: функция (client, номер запроса) -> ответ}."""
+    author, group, post = (
+        targets['author'], targets['group'], targets['post'])
+    to_follow = targets['to_follow']
+    return {
+        'index': lambda client, i: client.get(reverse('posts:index')),
+        'group_posts': lambda client, i: client.get(
+            reverse('posts:group_list', args=(group.slug,))),
+        'profile': lambda client, i: client.get(
+            reverse('posts:profile', args=(author.username,))),
+        'post_detail': lambda client, i: client.get(
+            reverse('posts:post_detail', args=(post.pk,))),
+        'follow_index': lambda client, i: client.get(
+            reverse('posts:follow_index')),
+        'add_comment': lambda client, i: client.post(
+            reverse('posts:add_comment', args=(post.pk,)),
+            {'text': f'Замер {i}'}),
+        # каждый раз новый автор, иначе get_or_create ничего не пишет
+        'profile_follow': lambda client, i: client.get(
+            reverse('posts:profile_follow',
+                    args=(to_follow[i % len(to_follow)],))),
+    }
+
+
+def measure(client, call, requests, cold=False):
+    """Задержка и запросы за requests вызовов, пик памяти - за
+    отдельный вызов: tracemalloc сам заметно замедляет код."""
+    call(client, 0)
+    timings, queries = [], []
+    for i in range(1, requests + 1):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = call(client, i)
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            raise CommandError(f'Ответ {response.status_code}')
+        queries.append(len(captured))
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        call(client, requests + 1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    result = {
+        f'p{percent}_ms': round(percentile(timings, percent), 3)
+        for percent in PERCENTILES
+    }
+    result['queries'] = max(queries)
+    result['peak_kib'] = round(peak / 1024, 1)
+    return result
+
+
+def measure_views(requests, cold=False):
+    """{представление: метрики} на текущей базе."""
+    targets = pick_targets()
+    client = Client()
+    client.force_login(targets['reader'])
+    cache.clear()
+    return {
+        name: measure(client, call, requests, cold)
+        for name, call in scenarios(targets).items()
+    }
+
+
+def compare(baseline, current, threshold):
+    """Список регрессий: p95 выросло больше чем на threshold
+    (и больше шума) или стало больше запросов к БД."""
+    regressions = []
+    for size, views in current['sizes'].items():
+        for view, metrics in views.items():
+            base = baseline['sizes'].get(size, {}).get(view)
+            if base is None:
+                continue
+            before, after = base['p95_ms'], metrics['p95_ms']
+            if (after > before * (1 + threshold)
+                    and after - before > NOISE_MS):
+                regressions.append(
+                    f'{size} {view}: p95 {before} -> {after} мс')
+            if metrics['queries'] > base['queries']:
+                regressions.append(
+                    f'{size} {view}: запросов '
+                    f'{base["queries"]} -> {metrics["queries"]}')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку, запросы и память представлений постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=list(SIZES),
+            help='число постов в наборах данных'
+        )
+        parser.add_argument('--requests', type=int, default=30)
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='очищать кэш перед каждым запросом'
+        )
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help='мерить на текущей базе, без тестовой базы и засева'
+        )
+        parser.add_argument('--output', help='куда записать JSON')
+        parser.add_argument('--compare', help='JSON прошлого прогона')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='допустимый рост p95, доля'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        # базовый прогон читается сразу: --output может указывать
+        # на тот же файл
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as source:
+                baseline = json.load(source)
+        result = {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'requests': options['requests'],
+            'cold': options['cold'],
+            'sizes': {},
+        }
+        # тестовый клиент ходит на testserver; кэш - свой на прогон,
+        # cache.clear() замеров не должен чистить кэш сайта
+        hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+                ALLOWED_HOSTS=hosts, CACHES=bench_caches(directory)):
+            if options['in_place']:
+                size = str(Post.objects.count())
+                result['sizes'][size] = self.run(options)
+            else:
+                for size in options['sizes']:
+                    result['sizes'][str(size)] = self.run_isolated(
+                        size, options)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            regressions = compare(baseline, result, options['threshold'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions))
+            self.stdout.write('Регрессий нет')
+
+    def run_isolated(self, size, options):
+        """Отдельная тестовая база на каждый размер: рабочая не
+        трогается, а замеры не зависят от предыдущего набора."""
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.monotonic()
+            call_command(
+                'seed_yatube', seed=options['seed'], stdout=self.stdout,
+                **dataset(size))
+            self.stdout.write(
+                f'Засев {size}: {time.monotonic() - started:.1f} с')
+            return self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        views = measure_views(options['requests'], options['cold'])
+        size = Post.objects.count()
+        for view, metrics in views.items():
+            self.stdout.write(
+                f'{size:>8} {view:<15} ' + ' '.join(
+                    f'{name}={value}' for name, value in metrics.items()))
+        return views
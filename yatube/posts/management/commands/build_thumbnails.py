@@ -0,0 +1,43 @@
+from concurrent.futures import as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import (get_executor, make_thumbnail_dirs,
+                              render_thumbnails, save_thumbnails,
+                              thumbnail_names)
+
+
+class Command(BaseCommand):
+    help = 'Готовит миниатюры для постов, у которых их еще нет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересобрать миниатюры у всех постов с картинками'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(thumbnails='')
+        executor = get_executor()
+        futures = {}
+        for post in posts.only('image').iterator():
+            names = thumbnail_names(post.image.name)
+            make_thumbnail_dirs(settings.MEDIA_ROOT, names)
+            future = executor.submit(
+                render_thumbnails, post.image.path, settings.MEDIA_ROOT,
+                names)
+            futures[future] = post
+        done = failed = 0
+        for future in as_completed(futures):
+            post = futures[future]
+            try:
+                save_thumbnails(post.pk, post.image.name, future.result())
+                done += 1
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Пост {post.pk}: {error}')
+        self.stdout.write(f'Готово: {done}, с ошибками: {failed}')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from posts.models import PostSearchIndex
+from posts.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Перестраивает полнотекстовый индекс постов '
+            'и восстанавливает его триггеры')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='база данных, по умолчанию default'
+        )
+
+    def handle(self, *args, **options):
+        database = options['database']
+        if not rebuild_search_index(connections[database]):
+            raise CommandError('Поиск FTS5 работает только на SQLite')
+        count = PostSearchIndex.objects.using(database).count()
+        self.stdout.write(f'Постов в индексе: {count}')
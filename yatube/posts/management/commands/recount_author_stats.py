@@ -0,0 +1,47 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import (AUTHOR_STATS_COUNTERS, AuthorStats,
+                          annotate_author_stats)
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счетчики AuthorStats и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='только показать расхождения, ничего не записывая'
+        )
+
+    def handle(self, *args, batch_size, dry_run, **options):
+        fields = list(AUTHOR_STATS_COUNTERS)
+        stored = {
+            row['user_id']: row for row in
+            AuthorStats.objects.values('user_id', *fields).iterator()
+        }
+        to_create, to_update = [], []
+        users = annotate_author_stats(
+            User.objects.order_by('pk')).values('pk', *fields)
+        for row in users.iterator(chunk_size=batch_size):
+            user_id = row.pop('pk')
+            stats = AuthorStats(user_id=user_id, **row)
+            current = stored.get(user_id)
+            if current is None:
+                to_create.append(stats)
+            elif any(current[field] != row[field] for field in fields):
+                to_update.append(stats)
+        self.stdout.write(
+            f'Новых строк: {len(to_create)}, '
+            f'с расхождениями: {len(to_update)}'
+        )
+        if dry_run:
+            return
+        # размер пачки для INSERT Django 2.2 подбирает сам: явный
+        # batch_size не урезается до лимитов SQLite
+        AuthorStats.objects.bulk_create(to_create)
+        AuthorStats.objects.bulk_update(
+            to_update, fields, batch_size=batch_size)
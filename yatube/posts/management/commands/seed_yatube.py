@@ -0,0 +1,336 @@
+"""Синтетические данные в масштабе продакшена: пользователи, группы,
+посты, комментарии и подписки пачками bulk_create.
+
+Активность авторов и число подписчиков распределены по Ципфу:
+несколько авторов пишут большую часть постов и собирают большую часть
+подписчиков, у остальных - длинный хвост. Так же распределены
+комментарии по постам. Сигналы при bulk_create не приходят, поэтому
+производные данные (comment_count, ленты подписок, AuthorStats)
+заполняются здесь же.
+
+    python manage.py seed_yatube --users 100000 --posts 2000000 \\
+        --comments 5000000 --follows 1000000 --images 500
+"""
+import os
+import random
+import time
+from array import array
+from bisect import bisect
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts.models import (FANOUT_LIMIT, AuthorStats, Comment, Follow, Group,
+                          Post, TimelineEntry)
+
+User = get_user_model()
+
+SEED_IMAGE_DIR = 'posts/seed'
+SEED_IMAGE_SIZE = (1280, 720)
+# за какой период раскиданы даты постов
+SEED_PERIOD = timedelta(days=365)
+# такой пароль не подходит ни к чему (см. make_password(None))
+UNUSABLE_PASSWORD = '!seed'
+WORD_POOL: int = 3000
+NAME_POOL: int = 500
+
+
+def zipf_cum_weights(count, exponent):
+    """Накопленные веса рангов 1..count: вес ранга r - 1 / r^s."""
+    total = 0.0
+    weights = array('d')
+    for rank in range(1, count + 1):
+        total += rank ** -exponent
+        weights.append(total)
+    return weights
+
+
+def draw(rng, first_id, cum_weights, count):
+    """count id из first_id.. по весам; choices() без population
+    не строит список всех id."""
+    total = cum_weights[-1]
+    last = len(cum_weights) - 1
+    return [
+        first_id + min(bisect(cum_weights, rng.random() * total), last)
+        for _ in range(count)
+    ]
+
+
+def make_image(path, seed):
+    """Выполняется в процессе пула: случайная картинка-заглушка."""
+    rng = random.Random(seed)
+    image = Image.new('RGB', SEED_IMAGE_SIZE, tuple(
+        rng.randrange(256) for _ in range(3)))
+    draw_ = ImageDraw.Draw(image)
+    width, height = SEED_IMAGE_SIZE
+    for _ in range(12):
+        x, y = rng.randrange(width), rng.randrange(height)
+        draw_.ellipse(
+            (x, y, x + rng.randrange(50, 400), y + rng.randrange(50, 400)),
+            fill=tuple(rng.randrange(256) for _ in range(3)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    image.save(path, 'JPEG', quality=85)
+    return path
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даты из данных, а не auto_now/auto_now_add."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Заполняет базу синтетическими данными для нагрузочных замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=5000)
+        parser.add_argument(
+            '--images', type=int, default=0,
+            help='сколько постов получат картинки (с миниатюрами)'
+        )
+        parser.add_argument('--workers', type=int, default=os.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--zipf', type=float, default=1.1,
+            help='показатель распределения Ципфа'
+        )
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужны хотя бы 2 пользователя и 1 пост')
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        fake = Faker('ru_RU')
+        fake.seed_instance(options['seed'])
+        self.words = fake.words(WORD_POOL)
+        self.names = [
+            (fake.first_name(), fake.last_name()) for _ in range(NAME_POOL)
+        ]
+        self.now = timezone.now()
+
+        users = self.create_users()
+        groups = self.create_groups()
+        posts = self.create_posts(users, groups)
+        self.create_comments(users, posts)
+        follows = self.create_follows(users)
+        self.fill_timelines(posts, follows)
+        self.reset_sequences()
+        call_command('recount_author_stats', stdout=self.stdout)
+        # посты популярных авторов по лентам не разложены
+        AuthorStats.objects.filter(
+            followers_count__gte=FANOUT_LIMIT).update(fanout_skipped=True)
+        # закэшированные счетчики и страницы больше не верны; кэш
+        # (CACHES) у каждой копии проекта свой, у benchmark_views -
+        # временный
+        cache.clear()
+        if options['images']:
+            call_command('build_thumbnails', stdout=self.stdout)
+
+    def bulk(self, model, objects, **kwargs):
+        started, created = time.monotonic(), 0
+        objects = iter(objects)
+        while True:
+            batch = list(islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            created += len(batch)
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {created} '
+            f'за {time.monotonic() - started:.1f} с'
+        )
+
+    def text(self, low, high):
+        return ' '.join(self.rng.choices(
+            self.words, k=self.rng.randint(low, high))).capitalize()
+
+    def create_users(self):
+        first_id, count = next_id(User), self.options['users']
+
+        def users():
+            for user_id in range(first_id, first_id + count):
+                first_name, last_name = self.rng.choice(self.names)
+                yield User(
+                    id=user_id, username=f'seed{user_id}',
+                    first_name=first_name, last_name=last_name,
+                    password=UNUSABLE_PASSWORD, date_joined=self.now)
+        self.bulk(User, users())
+        return first_id, count
+
+    def create_groups(self):
+        first_id, count = next_id(Group), self.options['groups']
+        self.bulk(Group, (
+            Group(
+                id=group_id, title=self.text(1, 3)[:200],
+                slug=f'seed-{group_id}', description=self.text(5, 20))
+            for group_id in range(first_id, first_id + count)
+        ))
+        return first_id, count
+
+    def create_posts(self, users, groups):
+        """Авторы по Ципфу, даты равномерно за SEED_PERIOD.
+        Возвращает (first_id, авторы, даты) - для комментариев и лент."""
+        first_id, count = next_id(Post), self.options['posts']
+        zipf = self.options['zipf']
+        authors = array('l', draw(
+            self.rng, users[0], zipf_cum_weights(users[1], zipf), count))
+        group_weights = zipf_cum_weights(max(groups[1], 1), zipf)
+        period = SEED_PERIOD.total_seconds()
+        start = (self.now - SEED_PERIOD).timestamp()
+        dates = array('d', (
+            start + self.rng.random() * period for _ in range(count)))
+        # комментарии тоже по Ципфу: обсуждают немногие посты
+        self.comment_posts = draw(
+            self.rng, first_id, zipf_cum_weights(count, zipf),
+            self.options['comments'])
+        comment_counts = Counter(self.comment_posts)
+        images = self.create_images(first_id, count)
+        tz = timezone.utc
+
+        def posts():
+            for offset in range(count):
+                post_id = first_id + offset
+                has_group = groups[1] and self.rng.random() < 0.6
+                yield Post(
+                    id=post_id, author_id=authors[offset],
+                    group_id=draw(
+                        self.rng, groups[0], group_weights, 1
+                    )[0] if has_group else None,
+                    text=self.text(5, 60),
+                    pub_date=datetime.fromtimestamp(dates[offset], tz),
+                    updated_at=self.now,
+                    comment_count=comment_counts[post_id],
+                    image=images.get(post_id, ''))
+        fields = Post._meta
+        with explicit_dates(fields.get_field('pub_date'),
+                            fields.get_field('updated_at')):
+            self.bulk(Post, posts())
+        return first_id, authors, dates
+
+    def create_images(self, first_id, count):
+        """{post_id: имя файла}: картинки рисует пул процессов,
+        миниатюры потом готовит build_thumbnails."""
+        total = min(self.options['images'], count)
+        if not total:
+            return {}
+        post_ids = self.rng.sample(range(first_id, first_id + count), total)
+        names = {
+            post_id: f'{SEED_IMAGE_DIR}/{post_id}.jpg' for post_id in post_ids
+        }
+        started = time.monotonic()
+        with ProcessPoolExecutor(max_workers=self.options['workers']) as pool:
+            list(pool.map(
+                make_image,
+                [os.path.join(settings.MEDIA_ROOT, name)
+                 for name in names.values()],
+                [self.rng.random() for _ in names],
+                chunksize=16
+            ))
+        self.stdout.write(
+            f'Картинки: {total} за {time.monotonic() - started:.1f} с')
+        return names
+
+    def create_comments(self, users, posts):
+        first_post_id, _, dates = posts
+        tz = timezone.utc
+        now = self.now.timestamp()
+
+        def comments():
+            for post_id in self.comment_posts:
+                published = dates[post_id - first_post_id]
+                created = min(
+                    published + self.rng.expovariate(1 / 86400), now)
+                yield Comment(
+                    post_id=post_id,
+                    author_id=users[0] + self.rng.randrange(users[1]),
+                    text=self.text(3, 30),
+                    created=datetime.fromtimestamp(created, tz))
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk(Comment, comments())
+        del self.comment_posts
+
+    def create_follows(self, users):
+        """Подписчик - любой пользователь, автор - по Ципфу:
+        число подписчиков распределено по степенному закону."""
+        first_id, count = users
+        wanted = min(self.options['follows'], count * (count - 1))
+        weights = zipf_cum_weights(count, self.options['zipf'])
+        pairs = set()
+        attempts = 0
+        while len(pairs) < wanted and attempts < wanted * 20:
+            batch = wanted - len(pairs)
+            attempts += batch
+            readers = [
+                first_id + self.rng.randrange(count) for _ in range(batch)]
+            authors = draw(self.rng, first_id, weights, batch)
+            pairs.update(
+                (reader, author)
+                for reader, author in zip(readers, authors)
+                if reader != author
+            )
+        self.bulk(Follow, (
+            Follow(user_id=reader, author_id=author)
+            for reader, author in pairs
+        ), ignore_conflicts=True)
+        return pairs
+
+    def fill_timelines(self, posts, follows):
+        """Как TimelineEntry.objects.backfill: в ленту читателя попадают
+        все посты каждого не популярного автора (популярных добавляет
+        к ленте merged_feed при чтении)."""
+        first_post_id, authors, dates = posts
+        followers = Counter(author for _, author in follows)
+        by_author = defaultdict(list)
+        for offset, author_id in enumerate(authors):
+            if followers[author_id] and followers[author_id] < FANOUT_LIMIT:
+                by_author[author_id].append((dates[offset], offset))
+        tz = timezone.utc
+
+        def entries():
+            for reader, author in follows:
+                for date, offset in by_author.get(author, ()):
+                    yield TimelineEntry(
+                        user_id=reader, post_id=first_post_id + offset,
+                        pub_date=datetime.fromtimestamp(date, tz))
+        self.bulk(TimelineEntry, entries(), ignore_conflicts=True)
+
+    def reset_sequences(self):
+        """id задавались явно - на PostgreSQL и т.п. сдвигаем
+        последовательности (на SQLite список пуст)."""
+        sql = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post])
+        with connection.cursor() as cursor:
+            for statement in sql:
+                cursor.execute(statement)
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+# posts.models.FANOUT_LIMIT на момент миграции
+FANOUT_LIMIT = 1000
+
+
+def mark_popular(apps, schema_editor):
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gte=FANOUT_LIMIT).update(fanout_skipped=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='fanout_skipped',
+            field=models.BooleanField(default=False, verbose_name='Посты не раскладывались по лентам'),
+        ),
+        migrations.RunPython(mark_popular, migrations.RunPython.noop),
+    ]
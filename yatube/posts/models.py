@@ -1,9 +1,28 @@
-from django.db import models
+import json
+
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
-from django.db.models import UniqueConstraint
+from django.db.models import (Count, ExpressionWrapper, F, FloatField,
+                              OuterRef, Q, Subquery, UniqueConstraint)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils.functional import cached_property
+
+from .search import SEARCH_TABLE, SearchField, build_match
 
 User = get_user_model()
 
+# поля поста, которые выводятся в карточке ленты
+FEED_FIELDS = (
+    'text', 'pub_date', 'updated_at', 'image', 'thumbnails',
+    'comment_count', 'author_id', 'group_id',
+    'author__username', 'author__first_name', 'author__last_name',
+    'group__title', 'group__slug',
+)
+# у автора с таким числом подписчиков посты не раскладываются
+# по лентам при публикации, их добавляет к ленте запрос при чтении
+FANOUT_LIMIT: int = 1000
+FANOUT_BATCH_SIZE: int = 1000
+
 
 class Group(models.Model):
     class Meta:
@@ -17,12 +36,42 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа приходят одним JOIN,
+        а из таблиц берутся только выводимые в карточке поля."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+    def search(self, query):
+        """Посты по полнотекстовому запросу (см. posts.search).
+        score - релевантность по bm25: чем больше, тем выше пост."""
+        match = build_match(query)
+        if not match:
+            return self.none()
+        return self.filter(search_index__text__match=match).annotate(
+            score=ExpressionWrapper(
+                F('search_index__rank') * -1, output_field=FloatField())
+        ).order_by('-score', '-id')
+
+
 class Post(models.Model):
     class Meta:
         ordering = ['-pub_date']
         # added in 6 sprint (hope this will not ruin all)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # ленты идут по (pub_date, id) от новых к старым,
+        # см. core.paginators.CursorPaginator
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx'),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx'),
+        ]
 
     text = models.TextField(
         'Текст поста',
@@ -32,6 +81,12 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    # версия карточки поста в кэше: меняется при правке поста,
+    # переименовании его группы или автора (см. posts.signals)
+    updated_at = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -53,6 +108,29 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # sha256 загруженного файла: одинаковые картинки
+    # хранятся одним файлом (см. posts.uploads)
+    image_hash = models.CharField(
+        'Хэш картинки',
+        max_length=64,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
+    # поддерживается сигналами Comment (см. posts.signals)
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    # готовые миниатюры картинки (см. posts.thumbnails), JSON
+    thumbnails = models.TextField(
+        'Миниатюры',
+        blank=True,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def corrected_text(self):
         if not self.text:
@@ -61,6 +139,36 @@ class Post(models.Model):
         """this allows to change blanks in the admin view"""
     corrected_text.short_description = 'text'
 
+    @cached_property
+    def thumbnail_variants(self):
+        try:
+            variants = json.loads(self.thumbnails or '{}')
+        except ValueError:
+            return {}
+        return variants if isinstance(variants, dict) else {}
+
+    def srcset(self, fmt):
+        storage = self.image.storage
+        return ', '.join(
+            f'{storage.url(name)} {width}w'
+            for width, name in self.thumbnail_variants.get(fmt, ())
+        )
+
+    @property
+    def srcset_webp(self):
+        return self.srcset('webp')
+
+    @property
+    def srcset_jpeg(self):
+        return self.srcset('jpeg')
+
+    @property
+    def thumbnail_url(self):
+        variants = self.thumbnail_variants.get('jpeg')
+        if not variants:
+            return self.image.url
+        return self.image.storage.url(variants[-1][1])
+
     def __str__(self):
         # выводим текст поста
         return self.text[:15]
@@ -89,6 +197,11 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created_idx'),
+        ]
 
     def __str__(self):
         # выводим текст коммента
@@ -97,9 +210,12 @@ class Comment(models.Model):
 
 class Follow(models.Model):
     class Meta:
-        ordering = ['-user']
-        UniqueConstraint(name='follower_follows',
-                         fields=['user', 'author'])
+        verbose_name_plural = 'Подписки'
+        verbose_name = 'Подписка'
+        constraints = [
+            UniqueConstraint(name='follower_follows',
+                             fields=['user', 'author']),
+        ]
 
     user = models.ForeignKey(
         User,
@@ -115,6 +231,230 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+
+class AuthorStatsManager(models.Manager):
+    def for_user(self, user):
+        """Счетчики пользователя; если строки еще нет - пересчитать."""
+        try:
+            return self.get(user=user)
+        except self.model.DoesNotExist:
+            return self.recount(user.pk)
+
+    def recount(self, user_id):
+        counts = annotate_author_stats(
+            User.objects.filter(pk=user_id)
+        ).values(*AUTHOR_STATS_COUNTERS).get()
+        stats, _ = self.update_or_create(user_id=user_id, defaults=counts)
+        return stats
+
+    def bump(self, user_id, create=True, **deltas):
+        """Атомарно (через F) сдвигает счетчики на deltas.
+        При удалениях create=False: строку удаляемого пользователя
+        создавать нельзя."""
+        with transaction.atomic():
+            # Greatest: после bulk_create без сигналов счетчик
+            # мог отстать, уходить в минус ему нельзя
+            updated = self.filter(user_id=user_id).update(**{
+                field: Greatest(F(field) + delta, 0)
+                for field, delta in deltas.items()
+            })
+            if not updated and create:
+                self.recount(user_id)
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счетчики пользователя,
+    их поддерживают сигналы Post, Comment и Follow."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # посты автора лежат не во всех лентах подписчиков (он был
+    # популярным): лента подписок добавляет их запросом и после того,
+    # как подписчиков стало меньше FANOUT_LIMIT
+    fanout_skipped = models.BooleanField(
+        'Посты не раскладывались по лентам', default=False)
+
+    objects = AuthorStatsManager()
+
     class Meta:
-        verbose_name_plural = 'Подписки'
-        verbose_name = 'Подписка'
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.posts_count}'
+
+
+AUTHOR_STATS_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+
+
+def annotate_author_stats(users):
+    """Аннотирует пользователей настоящими значениями счетчиков."""
+    counters = {}
+    for field, (model, user_field) in AUTHOR_STATS_COUNTERS.items():
+        rows = model.objects.filter(
+            **{user_field: OuterRef('pk')}
+        ).order_by().values(user_field).annotate(
+            total=Count('pk')).values('total')
+        counters[field] = Coalesce(
+            Subquery(rows, output_field=models.IntegerField()), 0)
+    return users.annotate(**counters)
+
+
+class TimelineManager(models.Manager):
+    def feed(self, user):
+        """Лента подписок: диапазон по индексу (user, pub_date, post)."""
+        return self.filter(user=user).select_related(
+            'post__author', 'post__group'
+        ).only(
+            'user_id', 'pub_date', 'post_id',
+            *('post__' + field for field in FEED_FIELDS)
+        )
+
+    def _add(self, pairs):
+        """Раскладывает пары (user_id, post) пачками, повторы пропускает."""
+        batch = []
+        for user_id, post_id, pub_date in pairs:
+            batch.append(self.model(
+                user_id=user_id, post_id=post_id, pub_date=pub_date))
+            if len(batch) >= FANOUT_BATCH_SIZE:
+                self.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        self.bulk_create(batch, ignore_conflicts=True)
+
+    def readers(self, author_id):
+        """id подписчиков, в ленты которых раскладываются посты автора,
+        или None для популярного автора - их посты добавляет к ленте
+        merged_feed."""
+        if AuthorStats.objects.filter(
+                user_id=author_id,
+                followers_count__gte=FANOUT_LIMIT).exists():
+            return None
+        return list(Follow.objects.filter(
+            author_id=author_id).values_list('user_id', flat=True))
+
+    def fan_out(self, post):
+        """Пишет новый пост в ленты подписчиков автора,
+        возвращает readers()."""
+        followers = self.readers(post.author_id)
+        if followers is None:
+            self.skip_fanout(post.author_id)
+        elif followers:
+            self._add(
+                (user_id, post.pk, post.pub_date) for user_id in followers)
+        return followers
+
+    def skip_fanout(self, author_id):
+        AuthorStats.objects.filter(
+            user_id=author_id, fanout_skipped=False
+        ).update(fanout_skipped=True)
+
+    def skips_fanout(self, author_id):
+        """Посты автора добавляются к лентам запросом (merged_feed):
+        он популярен сейчас или был популярен."""
+        return AuthorStats.objects.filter(
+            Q(followers_count__gte=FANOUT_LIMIT) | Q(fanout_skipped=True),
+            user_id=author_id
+        ).exists()
+
+    def backfill(self, user_id, author_id):
+        """Все посты автора - в ленту нового подписчика, пачками."""
+        if self.skips_fanout(author_id):
+            self.skip_fanout(author_id)
+            return
+        posts = Post.objects.filter(author_id=author_id).values_list(
+            'id', 'pub_date').iterator(chunk_size=FANOUT_BATCH_SIZE)
+        self._add(
+            (user_id, post_id, pub_date) for post_id, pub_date in posts)
+
+    def drop(self, user_id, author_id):
+        self.filter(user_id=user_id, post__author_id=author_id).delete()
+
+    def popular(self, user):
+        """id авторов среди подписок читателя, чьи посты добавляются
+        к ленте запросом (см. skips_fanout)."""
+        return list(Follow.objects.filter(
+            Q(author__stats__followers_count__gte=FANOUT_LIMIT)
+            | Q(author__stats__fanout_skipped=True),
+            user=user
+        ).values_list('author_id', flat=True))
+
+    def merged_feed(self, user, popular):
+        """Гибридная часть: посты популярных авторов, которые
+        не раскладывались при публикации, добавляются к ленте в том же
+        запросе. Только чтение - страница может прийти с реплики."""
+        return Post.objects.for_feed().filter(
+            Q(id__in=self.filter(user=user).values('post_id'))
+            | Q(author_id__in=popular)
+        )
+
+
+class TimelineEntry(models.Model):
+    """Материализованная лента подписок: пост лежит в ленте
+    каждого подписчика автора (fan-out on write)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # копия Post.pub_date, чтобы лента читалась одним индексом
+    pub_date = models.DateTimeField('Дата публикации')
+
+    objects = TimelineManager()
+
+    class Meta:
+        ordering = ['-pub_date', '-post_id']
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx'
+            ),
+        ]
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'post'], name='timeline_user_post'),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+class PostSearchIndex(models.Model):
+    """Строка FTS5-индекса постов (см. posts.search). Только для
+    чтения: таблицу создает миграция, а заполняют триггеры."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        related_name='search_index'
+    )
+    text = SearchField()
+    # скрытый столбец FTS5, по умолчанию bm25: чем меньше, тем лучше
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = SEARCH_TABLE
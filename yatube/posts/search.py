@@ -0,0 +1,90 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+posts_post_fts - индекс с внешним содержимым (content='posts_post'):
+текст хранится только в posts_post, а индекс поддерживают триггеры,
+поэтому он не отстает и при bulk_create, update() и удалениях
+без сигналов. Запрос пользователя разбирается на слова, слово
+со звездочкой на конце (`прив*`) ищется по префиксу."""
+import re
+
+from django.db import models
+
+SEARCH_TABLE = 'posts_post_fts'
+# больше слов в запросе не учитываем
+MAX_TERMS: int = 10
+TERM_RE = re.compile(r'(\w+)(\*?)')
+
+CREATE_TABLE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+CREATE_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {SEARCH_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+)
+DROP_TABLE = f'DROP TABLE IF EXISTS {SEARCH_TABLE}'
+DROP_TRIGGERS = tuple(
+    f'DROP TRIGGER IF EXISTS {SEARCH_TABLE}_{action}'
+    for action in ('insert', 'delete', 'update')
+)
+REBUILD = f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"
+
+
+class SearchField(models.TextField):
+    """Столбец FTS5: поддерживает lookup `match`."""
+
+
+@SearchField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+def build_match(query):
+    """Строка запроса -> выражение MATCH: слова в кавычках (операторы
+    FTS5 из пользовательского ввода не работают), все слова
+    обязательны. Пустая строка, если искать нечего."""
+    terms = [
+        f'"{word}"{star}'
+        for word, star in TERM_RE.findall(query)[:MAX_TERMS]
+    ]
+    return ' '.join(terms)
+
+
+def ensure_search_index(connection):
+    """Создает индекс и триггеры, если их нет. Django пересоздает
+    таблицу при изменении полей в SQLite, и триггеры пропадают
+    вместе со старой таблицей - поэтому вызывается и после миграций."""
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        for sql in CREATE_TRIGGERS:
+            cursor.execute(sql)
+    return True
+
+
+def rebuild_search_index(connection):
+    if not ensure_search_index(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(REBUILD)
+    return True
@@ -0,0 +1,320 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .counters import (AUTHOR, FOLLOW, GROUP, INDEX, adjust_feed_counts,
+                       feed_count_key, post_count_keys)
+from .feed_cache import (POPULAR, POST, bump_feeds, forget_group_choices,
+                         lookup_key)
+from .models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+from .thumbnails import delete_thumbnails, schedule_thumbnails
+
+User = get_user_model()
+# поля, которые выводятся в карточках постов группы и автора
+GROUP_CARD_FIELDS = ('title', 'slug')
+AUTHOR_CARD_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, **kwargs):
+    instance._old_group_id = None
+    instance._old_image = None
+    instance._old_thumbnails = ''
+    instance._old_image_hash = ''
+    if instance.pk is not None:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image', 'thumbnails', 'image_hash').first()
+        if old is not None:
+            (instance._old_group_id, instance._old_image,
+             instance._old_thumbnails, instance._old_image_hash) = old
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        adjust_feed_counts(
+            post_count_keys(instance.author_id, instance.group_id), 1)
+        AuthorStats.objects.bump(instance.author_id, posts_count=1)
+        adjust_follow_counts(
+            instance.author_id, TimelineEntry.objects.fan_out(instance), 1)
+        return
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            adjust_feed_counts([feed_count_key(GROUP, old_group_id)], -1)
+        if instance.group_id is not None:
+            adjust_feed_counts([feed_count_key(GROUP, instance.group_id)], 1)
+
+
+def adjust_follow_counts(author_id, readers, delta):
+    """Правит число постов в лентах подписок. readers - None, если
+    посты автора добавляются к лентам запросом (skips_fanout): число
+    у подписчиков пересчитается при следующем чтении."""
+    if readers is None:
+        cache.delete_many([
+            feed_count_key(FOLLOW, user_id)
+            for user_id in Follow.objects.filter(
+                author_id=author_id).values_list('user_id', flat=True)
+        ])
+        return
+    adjust_feed_counts(
+        [feed_count_key(FOLLOW, user_id) for user_id in readers], delta)
+
+
+@receiver(pre_delete, sender=Post)
+def remember_timeline_readers(sender, instance, **kwargs):
+    # записи ленты удаляются каскадом раньше post_delete
+    instance._timeline_readers = list(TimelineEntry.objects.filter(
+        post_id=instance.pk).values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    adjust_feed_counts(
+        post_count_keys(instance.author_id, instance.group_id), -1)
+    AuthorStats.objects.bump(
+        instance.author_id, create=False, posts_count=-1)
+    readers = getattr(instance, '_timeline_readers', [])
+    if TimelineEntry.objects.skips_fanout(instance.author_id):
+        readers = None
+    adjust_follow_counts(instance.author_id, readers, -1)
+
+
+def bump_comment_count(post_id, delta):
+    # updated_at - чтобы перестроились карточки поста с числом
+    # комментариев
+    Post.objects.filter(pk=post_id).update(
+        comment_count=Greatest(F('comment_count') + delta, 0),
+        updated_at=timezone.now()
+    )
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.author_id, comments_count=1)
+        bump_comment_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    AuthorStats.objects.bump(
+        instance.author_id, create=False, comments_count=-1)
+    bump_comment_count(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.bump(instance.user_id, following_count=1)
+        AuthorStats.objects.bump(instance.author_id, followers_count=1)
+        TimelineEntry.objects.backfill(instance.user_id, instance.author_id)
+        # число сбрасываем после того, как лента уже изменилась
+        cache.delete(feed_count_key(FOLLOW, instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    AuthorStats.objects.bump(
+        instance.user_id, create=False, following_count=-1)
+    AuthorStats.objects.bump(
+        instance.author_id, create=False, followers_count=-1)
+    TimelineEntry.objects.drop(instance.user_id, instance.author_id)
+    cache.delete(feed_count_key(FOLLOW, instance.user_id))
+
+
+def post_feeds(post_ids, author_id, group_ids):
+    """Ленты, в которых видны карточки постов одного автора."""
+    feeds = [(INDEX, None), (AUTHOR, author_id)]
+    feeds += [(POST, post_id) for post_id in post_ids]
+    feeds += [(GROUP, group_id) for group_id in set(group_ids) - {None}]
+    readers = TimelineEntry.objects.readers(author_id)
+    if readers is None:
+        feeds.append((POPULAR, None))
+    else:
+        feeds += [(FOLLOW, user_id) for user_id in readers]
+    return feeds
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_feeds(sender, instance, **kwargs):
+    """Поднимает версии закэшированных страниц, где виден пост."""
+    bump_feeds(post_feeds(
+        (instance.pk,), instance.author_id,
+        (instance.group_id, getattr(instance, '_old_group_id', None))))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_feeds(sender, instance, **kwargs):
+    # число комментариев выводится и в карточках лент
+    post = Post.objects.filter(pk=instance.post_id).values_list(
+        'author_id', 'group_id').first()
+    if post is None:
+        # пост удаляется вместе с комментариями: ленты поднимет он
+        bump_feeds([(POST, instance.post_id)])
+        return
+    author_id, group_id = post
+    bump_feeds(post_feeds((instance.post_id,), author_id, (group_id,)))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_feeds(sender, instance, **kwargs):
+    bump_feeds([
+        (FOLLOW, instance.user_id),
+        (AUTHOR, instance.author_id),
+        (AUTHOR, instance.user_id),
+    ])
+
+
+def refresh_cards(posts):
+    """Новый updated_at - новые ключи карточек постов, затем
+    поднимаются все ленты, где эти карточки видны."""
+    by_author = {}
+    for pk, author_id, group_id in posts.values_list(
+            'pk', 'author_id', 'group_id'):
+        post_ids, group_ids = by_author.setdefault(author_id, ([], set()))
+        post_ids.append(pk)
+        group_ids.add(group_id)
+    if not by_author:
+        return
+    posts.update(updated_at=timezone.now())
+    feeds = []
+    for author_id, (post_ids, group_ids) in by_author.items():
+        feeds += post_feeds(post_ids, author_id, group_ids)
+    bump_feeds(list(dict.fromkeys(feeds)))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_feeds(sender, instance, **kwargs):
+    bump_feeds([(GROUP, instance.pk), (INDEX, None)])
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_posts(sender, instance, **kwargs):
+    # group_id постов обнуляет UPDATE без updated_at и сигналов
+    instance._post_ids = list(
+        Post.objects.filter(group=instance).values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Group)
+def refresh_group_posts(sender, instance, **kwargs):
+    post_ids = getattr(instance, '_post_ids', None)
+    if post_ids:
+        refresh_cards(Post.objects.filter(pk__in=post_ids))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def reset_group_choices(sender, **kwargs):
+    forget_group_choices()
+
+
+def card_fields(instance, fields, update_fields):
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return None
+    return tuple(getattr(instance, field) for field in fields)
+
+
+@receiver(pre_save, sender=Group)
+@receiver(pre_save, sender=User)
+def remember_card_fields(sender, instance, update_fields=None, **kwargs):
+    fields = GROUP_CARD_FIELDS if sender is Group else AUTHOR_CARD_FIELDS
+    instance._old_card_fields = None
+    # last_login при входе сохраняется с update_fields - его пропускаем
+    if instance.pk is None or card_fields(
+            instance, fields, update_fields) is None:
+        return
+    instance._old_card_fields = sender.objects.filter(
+        pk=instance.pk).values_list(*fields).first()
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=User)
+def refresh_post_cards(sender, instance, created, **kwargs):
+    """Переименование группы или автора меняет updated_at его постов:
+    закэшированные карточки и страницы с ними перестраиваются."""
+    old = getattr(instance, '_old_card_fields', None)
+    if created or old is None:
+        return
+    if sender is Group:
+        if old == card_fields(instance, GROUP_CARD_FIELDS, None):
+            return
+        posts = Post.objects.filter(group=instance)
+    else:
+        if old == card_fields(instance, AUTHOR_CARD_FIELDS, None):
+            return
+        posts = Post.objects.filter(author=instance)
+    refresh_cards(posts)
+
+
+def sharing_posts(image_hash, image_name, exclude_pk):
+    """Другие посты с тем же файлом картинки (см. posts.uploads)."""
+    if not image_hash or not image_name:
+        return Post.objects.none()
+    return Post.objects.filter(
+        image_hash=image_hash, image=image_name).exclude(pk=exclude_pk)
+
+
+@receiver(post_save, sender=Post)
+def prepare_thumbnails(sender, instance, created, **kwargs):
+    old_image = getattr(instance, '_old_image', None)
+    if not created and instance.image.name == old_image:
+        return
+    if not created and instance._old_thumbnails:
+        if not sharing_posts(instance._old_image_hash, old_image,
+                             instance.pk).exists():
+            delete_thumbnails(instance._old_thumbnails)
+        Post.objects.filter(pk=instance.pk).update(thumbnails='')
+        instance.thumbnails = ''
+    if not instance.image:
+        return
+    # повторная загрузка той же картинки: миниатюры уже готовы
+    thumbnails = sharing_posts(
+        instance.image_hash, instance.image.name, instance.pk
+    ).exclude(thumbnails='').values_list('thumbnails', flat=True).first()
+    if thumbnails:
+        Post.objects.filter(pk=instance.pk).update(thumbnails=thumbnails)
+        instance.thumbnails = thumbnails
+        return
+    schedule_thumbnails(instance)
+
+
+@receiver(post_delete, sender=Post)
+def remove_thumbnails(sender, instance, **kwargs):
+    if sharing_posts(instance.image_hash, instance.image.name,
+                     instance.pk).exists():
+        return
+    delete_thumbnails(instance.thumbnails)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def forget_lookups(sender, instance, **kwargs):
+    """id по slug или username (cached_lookup) - и по старому
+    значению, и по новому: имя может достаться другому."""
+    if sender is Group:
+        field, fields = 'slug', GROUP_CARD_FIELDS
+    else:
+        field, fields = 'username', AUTHOR_CARD_FIELDS
+    values = {getattr(instance, field)}
+    old = getattr(instance, '_old_card_fields', None)
+    if old is not None:
+        values.add(dict(zip(fields, old))[field])
+    cache.delete_many(
+        [lookup_key(sender, 'pk', **{field: value}) for value in values])
+
+
+@receiver(post_delete, sender=Post)
+def forget_post_author(sender, instance, **kwargs):
+    cache.delete(lookup_key(Post, 'author_id', pk=instance.pk))
@@ -0,0 +1,79 @@
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..counters import GROUP, feed_count_key
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass')
+        cls.author = User.objects.create_user(username='author')
+        cls.old_group = Group.objects.create(
+            title='Старая', slug='old', description='-')
+        cls.new_group = Group.objects.create(
+            title='Новая', slug='new', description='-')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.url = reverse('admin:posts_post_changelist')
+
+    def create_posts(self, count):
+        for i in range(count):
+            group = Group.objects.create(
+                title=f'Группа {count}-{i}', slug=f'group-{count}-{i}',
+                description='-')
+            Post.objects.create(
+                author=self.author, group=group, text=f'Пост {i}')
+
+    def changelist_queries(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_depend_on_rows(self):
+        self.create_posts(2)
+        few = self.changelist_queries()
+        self.create_posts(20)
+        cache.clear()
+        self.changelist_queries()
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_move_to_group_single_update(self):
+        posts = [
+            Post.objects.create(
+                author=self.author, group=self.old_group, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        old_key = feed_count_key(GROUP, self.old_group.pk)
+        new_key = feed_count_key(GROUP, self.new_group.pk)
+        cache.set(old_key, 3)
+        cache.set(new_key, 0)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(self.url, {
+                'action': 'move_to_group',
+                'group': self.new_group.pk,
+                helpers.ACTION_CHECKBOX_NAME: [post.pk for post in posts],
+            })
+        updates = [
+            query for query in queries
+            if query['sql'].startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(self.new_group.posts.count(), 3)
+        self.assertEqual(cache.get(old_key), 0)
+        self.assertEqual(cache.get(new_key), 3)
@@ -0,0 +1,82 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+
+from ..management.commands.benchmark_views import (bench_caches, compare,
+                                                   percentile)
+from ..models import Comment, Follow
+
+
+class BenchmarkCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_yatube', users=30, groups=3, posts=100, comments=100,
+            follows=60, seed=1, stdout=StringIO()
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'bench.json')
+
+    def run_benchmark(self, **options):
+        call_command(
+            'benchmark_views', in_place=True, requests=3,
+            output=self.output, stdout=StringIO(), **options
+        )
+        with open(self.output) as output:
+            return json.load(output)
+
+    def test_report(self):
+        follows, comments = Follow.objects.count(), Comment.objects.count()
+        result = self.run_benchmark()
+        views = result['sizes']['100']
+        self.assertEqual(set(views), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'add_comment', 'profile_follow',
+        })
+        for metrics in views.values():
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+            self.assertGreater(metrics['peak_kib'], 0)
+        # прогрев, 3 замера и вызов под tracemalloc
+        self.assertEqual(Comment.objects.count(), comments + 5)
+        self.assertEqual(Follow.objects.count(), follows + 5)
+
+    def test_own_cache(self):
+        """cache.clear() замеров не трогает кэш сайта."""
+        cache.set('site', 1)
+        self.run_benchmark(cold=True)
+        self.assertEqual(cache.get('site'), 1)
+        site = {'default': {
+            'BACKEND': 'core.sqlite_cache.SQLiteCache',
+            'LOCATION': '/srv/yatube/cache.sqlite3',
+        }}
+        with override_settings(CACHES=site):
+            self.assertEqual(
+                bench_caches('/tmp/bench')['default']['LOCATION'],
+                '/tmp/bench/cache.sqlite3')
+
+    def test_compare(self):
+        baseline = self.run_benchmark()
+        metrics = baseline['sizes']['100']['index']
+        metrics['p95_ms'] = 0
+        metrics['queries'] -= 1
+        self.assertEqual(len(compare(baseline, baseline, 0.2)), 0)
+        with open(self.output, 'w') as output:
+            json.dump(baseline, output)
+        with self.assertRaisesMessage(CommandError, '100 index'):
+            self.run_benchmark(compare=self.output)
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
@@ -7,6 +7,7 @@ from django.core.cache import cache
 
 
 from posts.models import Group, Post, Comment
+from posts.views import LIMIT_COMMENTS
 
 User = get_user_model()
 
@@ -76,3 +77,80 @@ class PostCreateFormTests(TestCase):
         # не появился на странице поста
         self.assertEqual(Comment.objects.count(), comments_count)
         self.assertRedirects(response, redirect)
+
+
+class CommentPagesTests(TestCase):
+    """Комментарии поста выводятся страницами по курсору."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(text='Пост', author=cls.user)
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}')
+            for i in range(LIMIT_COMMENTS + 5)
+        ]
+        for i, reader in enumerate(cls.readers):
+            Comment.objects.create(
+                post=cls.post, author=reader, text=f'Коммент {i}')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_comment_count(self):
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, LIMIT_COMMENTS + 5)
+        Comment.objects.filter(text='Коммент 0').delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, LIMIT_COMMENTS + 4)
+
+    def test_first_page_and_fragment(self):
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), LIMIT_COMMENTS)
+        self.assertEqual(comments[0].text, f'Коммент {LIMIT_COMMENTS + 4}')
+        self.assertTrue(comments.has_next())
+        cursor = comments.paginator.encode_cursor(comments[-1], 'n')
+        fragment = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': cursor}
+        )
+        self.assertEqual(len(fragment.context['comments']), 5)
+        self.assertContains(fragment, 'Коммент 0')
+        self.assertNotContains(fragment, 'Показать ещё')
+
+    def test_comment_authors_eager_loaded(self):
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        comments = first.context['comments']
+        cursor = comments.paginator.encode_cursor(comments[-1], 'n')
+        cache.clear()
+        # пост и одна страница комментариев с авторами
+        with self.assertNumQueries(2):
+            self.client.get(url, {'cursor': cursor})
+
+    def test_bad_cursor(self):
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': 'garbage'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_feed_cards_show_new_count(self):
+        """Комментарий сбрасывает закэшированные ленты с карточкой."""
+        count = LIMIT_COMMENTS + 5
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=(self.post.author.username,)),
+        ]
+        for url in urls:
+            self.assertContains(self.client.get(url), f'Комментариев: {count}')
+        Comment.objects.create(
+            post=self.post, author=self.post.author, text='Еще один')
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.client.get(url), f'Комментариев: {count + 1}')
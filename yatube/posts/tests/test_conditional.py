@@ -0,0 +1,87 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='-')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.urls = {
+            'post_detail': reverse(
+                'posts:post_detail', args=(self.post.pk,)),
+            'profile': reverse('posts:profile', args=('author',)),
+            'group_list': reverse('posts:group_list', args=('group',)),
+        }
+
+    def test_not_modified_without_queries(self):
+        for name, url in self.urls.items():
+            with self.subTest(view=name):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertNotIn('no-store', response['Cache-Control'])
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_change_invalidates_etag(self):
+        etags = {
+            name: self.client.get(url)['ETag']
+            for name, url in self.urls.items()
+        }
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.client.get(
+            self.urls['post_detail'], HTTP_IF_NONE_MATCH=etags['post_detail'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etags['post_detail'])
+        Post.objects.create(author=self.author, group=self.group, text='Еще')
+        for name in ('profile', 'group_list'):
+            with self.subTest(view=name):
+                response = self.client.get(
+                    self.urls[name], HTTP_IF_NONE_MATCH=etags[name])
+                self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        url = self.urls['profile']
+        etag = self.client.get(url)['ETag']
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_last_modified(self):
+        """Время изменения ленты общее для всех зрителей, поэтому
+        проверка идет только по ETag: If-Modified-Since после входа
+        не дает 304 на страницу гостя."""
+        url = self.urls['profile']
+        guest = self.client_class()
+        response = guest.get(url)
+        self.assertFalse(response.has_header('Last-Modified'))
+        modified_since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(
+            guest.get(url, HTTP_IF_MODIFIED_SINCE=modified_since).status_code,
+            200)
+        guest.force_login(self.author)
+        response = guest.get(url, HTTP_IF_MODIFIED_SINCE=modified_since)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Пользователь: author')
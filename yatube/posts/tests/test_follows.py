@@ -6,7 +6,8 @@ from django.urls import reverse
 from django.test import Client, TestCase
 from django.core.cache import cache
 
-from ..models import Post, Follow
+from ..models import (FANOUT_BATCH_SIZE, FANOUT_LIMIT, AuthorStats, Follow,
+                      Post, TimelineEntry)
 
 
 User = get_user_model()
@@ -67,7 +68,7 @@ class FollowViewsTest(TestCase):
                 kwargs={'username': self.author}))
         response = self.follower_client.get(
             reverse('posts:follow_index'))
-        self.assertEqual(post, response.context['page_obj'][0])
+        self.assertEqual(post, response.context['page_obj'][0].post)
 
     def test_post_not_showing_if_not_follower(self):
         """Пост не появляются у не подписчика"""
@@ -82,7 +83,7 @@ class FollowViewsTest(TestCase):
         response = self.follower_client.get(
             reverse('posts:follow_index'))
         # убедимся, что все работает
-        self.assertEqual(post, response.context['page_obj'][0])
+        self.assertEqual(post, response.context['page_obj'][0].post)
         # отпишемся, больше не подписчик
         self.follower_client.post(
             reverse(
@@ -90,4 +91,87 @@ class FollowViewsTest(TestCase):
                 kwargs={'username': self.author}))
         response = self.follower_client.get(
             reverse('posts:follow_index'))
-        self.assertNotIn(post, response.context['page_obj'])
+        self.assertNotIn(
+            post, [entry.post for entry in response.context['page_obj']])
+
+    def test_post_fanned_out_to_followers(self):
+        """Новый пост сразу записывается в ленты подписчиков."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post, pub_date=post.pub_date).exists())
+        post.delete()
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+
+    def test_popular_author_is_merged_on_read(self):
+        """Посты популярного автора не раскладываются, а добавляются
+        к ленте при чтении, которое ничего не пишет."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(
+            followers_count=FANOUT_LIMIT)
+        post = Post.objects.create(author=self.author, text='Популярный')
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'][0], post)
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists())
+        second = Post.objects.create(author=self.author, text='Еще один')
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['posts'], [second, post])
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        second.delete()
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+
+    def test_popular_posts_kept_below_limit(self):
+        """Посты, не разложенные по лентам, пока автор был популярен,
+        остаются в ленте, когда подписчиков стало меньше."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        AuthorStats.objects.filter(user=self.author).update(
+            followers_count=FANOUT_LIMIT)
+        popular = Post.objects.create(author=self.author, text='Популярный')
+        AuthorStats.objects.filter(user=self.author).update(
+            followers_count=FANOUT_LIMIT - 1)
+        later = Post.objects.create(author=self.author, text='Позже')
+        self.assertTrue(TimelineEntry.objects.filter(post=later).exists())
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['posts'], [later, popular])
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+
+    def test_follow_backfills_all_posts(self):
+        """При подписке в ленту попадают все посты автора."""
+        count = FANOUT_BATCH_SIZE + 5
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(count))
+        Follow.objects.create(user=self.follower, author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), count)
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        self.assertEqual(response.context['page_obj'].paginator.count, count)
+
+    def test_count_follows_deletes(self):
+        """Число постов в ленте подписок не расходится с лентой
+        после удаления поста и отписки."""
+        other = User.objects.create(username='other')
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=other)
+        post = Post.objects.create(author=self.author, text='Первый')
+        Post.objects.create(author=self.author, text='Второй')
+        Post.objects.create(author=other, text='Другого автора')
+        url = reverse('posts:follow_index')
+        steps = (
+            (lambda: None, 3),
+            (post.delete, 2),
+            (Follow.objects.filter(author=other).delete, 1),
+        )
+        for change, expected in steps:
+            change()
+            response = self.follower_client.get(url)
+            with self.subTest(expected=expected):
+                self.assertEqual(
+                    response.context['page_obj'].paginator.count, expected)
+                self.assertEqual(
+                    len(response.context['page_obj']), expected)
@@ -1,5 +1,8 @@
+import gc
+import io
 import shutil
 import tempfile
+import warnings
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
@@ -7,7 +10,7 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.cache import cache
-
+from PIL import Image
 
 from posts.models import Group, Post
 
@@ -138,3 +141,57 @@ class PostCreateFormTests(TestCase):
         # Group and author were not the subject to the change
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.group_id, form_data['group'])
+
+    def upload_jpeg(self, name, size, exif=None):
+        buffer = io.BytesIO()
+        image = Image.new('RGB', size, 'red')
+        image.save(buffer, 'JPEG', exif=exif or Image.Exif())
+        uploaded = SimpleUploadedFile(
+            name=name, content=buffer.getvalue(), content_type='image/jpeg')
+        return self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': name, 'image': uploaded},
+        )
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_upload_downscaled_without_exif(self):
+        """Большая картинка уменьшается, EXIF отбрасывается."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'  # Make
+        self.upload_jpeg('big.jpg', (400, 200), exif)
+        post = Post.objects.get(text='big.jpg')
+        self.assertEqual(len(post.image_hash), 64)
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(POST_IMAGE_MAX_SIDE=100)
+    def test_normalized_upload_leaves_no_open_files(self):
+        """Пересохраненная картинка не оставляет незакрытых файлов."""
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', ResourceWarning)
+            self.upload_jpeg('closed.jpg', (400, 200))
+            gc.collect()
+        self.assertTrue(Post.objects.filter(text='closed.jpg').exists())
+        self.assertEqual(
+            [w for w in caught if issubclass(w.category, ResourceWarning)],
+            [])
+
+    def test_duplicate_upload_shares_file(self):
+        """Повторная загрузка того же файла не создает копию."""
+        self.upload_jpeg('first.jpg', (20, 10))
+        self.upload_jpeg('second.jpg', (20, 10))
+        first = Post.objects.get(text='first.jpg')
+        second = Post.objects.get(text='second.jpg')
+        self.assertEqual(first.image.name, 'posts/first.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_hash, first.image_hash)
+
+    @override_settings(POST_IMAGE_MAX_UPLOAD_SIZE=100)
+    def test_oversized_upload_rejected(self):
+        """Слишком большой файл не принимается формой."""
+        posts_count = Post.objects.count()
+        response = self.upload_jpeg('huge.jpg', (200, 200))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertEqual(Post.objects.count(), posts_count)
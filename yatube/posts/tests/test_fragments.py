@@ -0,0 +1,116 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.metrics import registry
+from ..models import Comment, Follow, Post
+
+User = get_user_model()
+
+
+class SharedPageTest(TestCase):
+    """Страница кэшируется одна на всех, части пользователя
+    подставляются при выдаче."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.stranger = User.objects.create_user(username='stranger')
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, text='<!--value:username--> пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.clients = {'anonymous': Client()}
+        for user in (self.author, self.follower, self.stranger):
+            self.clients[user.username] = Client()
+            self.clients[user.username].force_login(user)
+
+    def get_all(self, url):
+        return {
+            name: client.get(url) for name, client in self.clients.items()
+        }
+
+    def outcomes(self, view):
+        return registry.snapshot()[view]['page_cache']
+
+    def test_one_render_for_all_viewers(self):
+        responses = self.get_all(reverse('posts:index'))
+        self.assertEqual(
+            self.outcomes('posts:index'), {'rebuilt': 1, 'hit': 3})
+        self.assertNotContains(responses['anonymous'], 'Выйти')
+        self.assertContains(responses['anonymous'], 'Войти')
+        for name in ('author', 'follower', 'stranger'):
+            with self.subTest(user=name):
+                self.assertContains(responses[name], f'Пользователь: {name}')
+                self.assertNotContains(responses[name], 'Войти')
+                self.assertContains(responses[name], 'Избранные авторы')
+        for response in responses.values():
+            self.assertNotContains(response, '<!--fragment:')
+            # текст поста экранирован и меткой не считается
+            self.assertContains(response, '&lt;!--value:username--&gt;')
+
+    def test_follow_button(self):
+        responses = self.get_all(
+            reverse('posts:profile', args=(self.author.username,)))
+        self.assertEqual(
+            self.outcomes('posts:profile'), {'rebuilt': 1, 'hit': 3})
+        buttons = {
+            'anonymous': 'Подписаться',
+            'author': None,
+            'follower': 'Отписаться',
+            'stranger': 'Подписаться',
+        }
+        for name, button in buttons.items():
+            with self.subTest(user=name):
+                for label in ('Подписаться', 'Отписаться'):
+                    if label == button:
+                        self.assertContains(responses[name], label)
+                    else:
+                        self.assertNotContains(responses[name], label)
+
+    def test_edit_link_and_comment_form(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        responses = self.get_all(url)
+        edit = reverse('posts:post_edit', args=(self.post.pk,))
+        self.assertContains(responses['author'], edit)
+        for name in ('anonymous', 'follower', 'stranger'):
+            with self.subTest(user=name):
+                self.assertNotContains(responses[name], edit)
+        self.assertNotContains(responses['anonymous'], 'Добавить комментарий')
+        # токен CSRF - свой у каждого, хотя страница взята из кэша
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.stranger)
+        response = client.get(url)
+        self.assertIsNone(response.context)
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="(\w+)"',
+            response.content.decode()).group(1)
+        response = client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comment.objects.filter(author=self.stranger).exists())
+
+    def test_follow_feed_is_per_user(self):
+        url = reverse('posts:follow_index')
+        self.clients['follower'].get(url)
+        response = self.clients['stranger'].get(url)
+        self.assertIsNotNone(response.context)
+        self.assertNotContains(response, 'пост')
+        self.assertContains(self.clients['follower'].get(url), 'пост')
+        self.assertEqual(
+            self.outcomes('posts:follow_index'),
+            {'rebuilt': 2, 'hit': 1})
+
+    def test_uncached_page_has_no_markers(self):
+        response = self.clients['author'].get(reverse('posts:search'))
+        self.assertContains(response, 'Пользователь: author')
+        self.assertNotContains(response, '<!--fragment:')
+        self.assertNotContains(response, '<!--value:')
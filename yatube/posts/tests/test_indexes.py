@@ -0,0 +1,77 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from core.paginators import CursorPaginator
+from ..models import Comment, Follow, Group, Post, TimelineEntry
+from ..views import LIMIT_POSTS
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'план запроса в формате SQLite')
+class FeedIndexesTest(TestCase):
+    """Запросы лент идут по индексам: таблица не сканируется целиком
+    и не досортировывается во временном B-дереве."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост')
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(index, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def feed_page(self, queryset, **kwargs):
+        return CursorPaginator(
+            queryset, LIMIT_POSTS, **kwargs).page(1).object_list
+
+    def test_post_feeds(self):
+        feeds = {
+            'post_date_idx': Post.objects.for_feed(),
+            'post_author_date_idx':
+                Post.objects.for_feed().filter(author=self.author),
+            'post_group_date_idx':
+                Post.objects.for_feed().filter(group=self.group),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                self.assertUsesIndex(self.feed_page(queryset), index)
+
+    def test_follow_feed(self):
+        self.assertUsesIndex(
+            self.feed_page(
+                TimelineEntry.objects.feed(self.reader),
+                keys=('pub_date', 'post_id')
+            ),
+            'timeline_user_date_idx'
+        )
+
+    def test_comments(self):
+        self.assertUsesIndex(
+            Comment.objects.filter(post=self.post).order_by(
+                '-created', '-id'),
+            'comment_post_created_idx'
+        )
+
+    def test_follow_lookup(self):
+        plan = Follow.objects.filter(
+            user=self.reader, author=self.author).explain()
+        self.assertIn('INDEX', plan)
+        self.assertIn('user_id=? AND author_id=?', plan)
+
+    def test_follow_is_unique(self):
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(user=self.reader, author=self.author)
@@ -0,0 +1,116 @@
+import time
+import warnings
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.metrics import registry
+from .. import feed_cache
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.create(author=cls.author, text='Первый пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.url = reverse('posts:index')
+
+    def get_with_key(self):
+        keys, page_key = [], feed_cache.page_key
+
+        def capture(request):
+            keys.append(page_key(request))
+            return keys[-1]
+        with mock.patch.object(feed_cache, 'page_key', capture):
+            response = self.client.get(self.url)
+        return response, keys[0]
+
+    def outcomes(self):
+        return registry.snapshot()['posts:index']['page_cache']
+
+    def busy(self):
+        """Блокировку перестройки держит другой воркер."""
+        return mock.patch.object(feed_cache.cache, 'add', return_value=False)
+
+    def test_jittered_expiry(self):
+        before = time.time()
+        _, key = self.get_with_key()
+        _, fresh_until, _ = cache.get(key)
+        timeout = feed_cache.FEED_CACHE_TIMEOUT
+        self.assertGreaterEqual(
+            fresh_until, before + timeout * (1 - feed_cache.TIMEOUT_JITTER))
+        self.assertLessEqual(
+            fresh_until,
+            time.time() + timeout * (1 + feed_cache.TIMEOUT_JITTER))
+        self.client.get(self.url)
+        self.assertEqual(self.outcomes(), {'rebuilt': 1, 'hit': 1})
+
+    def test_stale_while_rebuilding(self):
+        old, key = self.get_with_key()
+        # мягкий срок истек, версия ленты прежняя
+        prefix, _, page = cache.get(key)
+        cache.set(key, (prefix, 0, page))
+        with self.busy():
+            response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertEqual(response.content, old.content)
+        # просроченной копии - без валидаторов
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertEqual(self.outcomes(), {'rebuilt': 1, 'stale': 1})
+
+    def test_no_stale_page_after_write(self):
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Второй пост')
+        # страницу под новой версией строит другой воркер, но
+        # старую копию автору не отдаем
+        with self.busy(), \
+                mock.patch.object(feed_cache, 'REBUILD_WAIT', 0.05):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Второй пост')
+        self.assertEqual(
+            self.outcomes(), {'rebuilt': 1, 'wait_timeout': 1})
+
+    def test_coalesced_wait(self):
+        first, key = self.get_with_key()
+        entry = cache.get(key)
+        cache.delete(key)
+        # пока этот запрос ждет, другой воркер кладет страницу в кэш
+        with self.busy(), mock.patch.object(
+                feed_cache.time, 'sleep',
+                side_effect=lambda seconds: cache.set(key, entry)):
+            response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        # в кэше - общая страница, пользователю - заполненная
+        self.assertEqual(response.content, first.content)
+        self.assertEqual(self.outcomes(), {'rebuilt': 1, 'coalesced': 1})
+
+    def test_wait_timeout(self):
+        with self.busy(), \
+                mock.patch.object(feed_cache, 'REBUILD_WAIT', 0.05):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Первый пост')
+        self.assertEqual(self.outcomes(), {'wait_timeout': 1})
+
+    def test_lookup_key_is_memcached_safe(self):
+        key = feed_cache.lookup_key(Group, 'pk', slug='Тестовый слаг')
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', CacheKeyWarning)
+            cache.validate_key(cache.make_key(key))
+        self.assertEqual(caught, [])
+        self.assertNotEqual(
+            key, feed_cache.lookup_key(Group, 'pk', slug='другой'))
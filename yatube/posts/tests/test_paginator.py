@@ -1,6 +1,9 @@
+from django.core.cache import cache
 from django.test import Client, TestCase
 from django.urls import reverse
 
+from core.paginators import NEXT, PREVIOUS, CursorPaginator
+from posts.counters import GROUP, feed_count_key
 from posts.models import Group, Post, User
 
 FIRST_PAGE = 10
@@ -26,6 +29,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(posts)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
 
     def test_paginator(self):
@@ -49,3 +53,65 @@ class PaginatorViewsTest(TestCase):
             with self.subTest(reverse_page=reverse_page):
                 self.assertEqual(len(self.guest_client.get(
                     reverse_page).context.get('page_obj')), pages_posts)
+
+    def test_cursor_pages(self):
+        """Курсоры ведут по всем постам без пропусков и повторов."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        page_obj = response.context.get('page_obj')
+        seen = list(page_obj)
+        self.assertEqual(len(seen), FIRST_PAGE)
+        self.assertContains(response, '?cursor=')
+        paginator = page_obj.paginator
+        next_url = url + '?cursor=' + paginator.encode_cursor(
+            seen[-1], NEXT)
+        page_obj = self.guest_client.get(next_url).context.get('page_obj')
+        self.assertEqual(len(page_obj), SECOND_PAGE)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+        seen += list(page_obj)
+        self.assertEqual(
+            [post.id for post in seen],
+            list(Post.objects.order_by('-pub_date', '-id')
+                 .values_list('id', flat=True))
+        )
+        previous_url = url + '?cursor=' + paginator.encode_cursor(
+            page_obj[0], PREVIOUS)
+        page_obj = self.guest_client.get(
+            previous_url).context.get('page_obj')
+        self.assertEqual(list(page_obj), seen[:FIRST_PAGE])
+        self.assertFalse(page_obj.has_previous())
+
+    def test_invalid_cursor(self):
+        """Битый курсор отдает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index') + '?cursor=broken')
+        self.assertEqual(
+            response.context.get('page_obj').number, 1)
+
+    def test_feed_count_follows_created_and_deleted_posts(self):
+        """Кэшированное количество постов меняется вместе с лентой."""
+        url = reverse('posts:group_list', kwargs={'slug': 'test-slug'})
+        key = feed_count_key(GROUP, self.group.id)
+        self.guest_client.get(url)
+        total = FIRST_PAGE + SECOND_PAGE
+        self.assertEqual(cache.get(key), total)
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Еще пост')
+        self.assertEqual(cache.get(key), total + 1)
+        post.group = None
+        post.save()
+        self.assertEqual(cache.get(key), total)
+        post.delete()
+        self.assertEqual(cache.get(key), total)
+        Post.objects.filter(group=self.group).first().delete()
+        self.assertEqual(cache.get(key), total - 1)
+
+    def test_page_window(self):
+        """Номера страниц выводятся окном вокруг текущей."""
+        posts = Post.objects.all()
+        paginator = CursorPaginator(posts, 1)
+        self.assertEqual(
+            list(paginator.get_elided_page_range(7)),
+            [1, paginator.ELLIPSIS, 5, 6, 7, 8, 9, paginator.ELLIPSIS, 13]
+        )
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.metrics import registry
+from core.middleware import QueryBudgetExceeded
+from ..models import Comment, Follow, Group, Post
+from ..views import LIMIT_POSTS
+
+User = get_user_model()
+
+
+class FeedQueriesTest(TestCase):
+    """Число запросов к БД на страницу ленты не зависит
+    от количества постов на ней."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def create_posts(self, count):
+        # у каждого поста своя группа, чтобы ленивая загрузка группы
+        # в шаблоне выдала себя лишними запросами
+        for i in range(count):
+            group = Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{count}-{i}',
+                description='-')
+            Post.objects.create(
+                author=self.author, group=group, text=f'Пост {i}')
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        feeds = {
+            # сессия, пользователь, COUNT, страница
+            reverse('posts:index'): 4,
+            # + id автора для ключа кэша, автор, его счетчики
+            # и подписка на него
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ): 8,
+            # + проверка популярных авторов среди подписок
+            reverse('posts:follow_index'): 5,
+        }
+        for count in (1, LIMIT_POSTS - 1):
+            Post.objects.all().delete()
+            self.create_posts(count)
+            for url, queries in feeds.items():
+                with self.subTest(url=url, posts=count):
+                    cache.clear()
+                    with self.assertNumQueries(queries):
+                        self.client.get(url)
+
+    def test_group_feed_queries(self):
+        for count in (1, LIMIT_POSTS - 1):
+            Post.objects.all().delete()
+            Post.objects.bulk_create(
+                Post(author=self.author, group=self.group, text=f'Пост {i}')
+                for i in range(count)
+            )
+            with self.subTest(posts=count):
+                cache.clear()
+                # сессия, пользователь, id группы для ключа кэша,
+                # группа, COUNT, страница
+                with self.assertNumQueries(6):
+                    self.client.get(reverse(
+                        'posts:group_list', kwargs={'slug': self.group.slug}
+                    ))
+
+
+@override_settings(PERF_ENFORCE_BUDGETS=True)
+class QueryBudgetTest(TestCase):
+    """Страницы укладываются в PERF_QUERY_BUDGETS."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(
+            username='reader', is_staff=True)
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(LIMIT_POSTS + 1):
+            cls.post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}')
+            Comment.objects.create(
+                post=cls.post, author=cls.reader, text=f'Комментарий {i}')
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_pages_within_budget(self):
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.client.get(url)
+
+    @override_settings(PERF_QUERY_BUDGETS={'posts:index': 1})
+    def test_budget_exceeded(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        index = self.client.get(reverse('perf_metrics')).json()['posts:index']
+        self.assertEqual(index['wall_ms']['count'], 2)
+        # вторая страница целиком из кэша
+        self.assertGreaterEqual(index['cache_hits'], 1)
+        self.assertGreater(index['queries']['sum'], 0)
+        self.assertGreater(index['template_ms']['sum'], 0)
+
+    def test_metrics_endpoint_is_staff_only(self):
+        client = Client()
+        client.force_login(self.author)
+        response = client.get(reverse('perf_metrics'))
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import routers
+from core.middleware import ReplicaPinMiddleware
+from ..models import Post
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.factory = RequestFactory()
+        # как внутри запроса без записи
+        routers.reset(pinned=False)
+        self.addCleanup(routers.reset)
+
+    def request(self, view, **cookies):
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies)
+        return ReplicaPinMiddleware(view)(request)
+
+    def read_view(self, request):
+        return HttpResponse(self.router.db_for_read(Post))
+
+    def write_view(self, request):
+        self.router.db_for_write(Post)
+        return self.read_view(request)
+
+    def test_reads_go_to_replica(self):
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        # сессии и пользователи - только из основной базы
+        self.assertEqual(self.router.db_for_read(User), 'default')
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(self.router.allow_migrate('default', 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica', 'posts'))
+
+    def test_use_primary(self):
+        with routers.use_primary():
+            self.assertEqual(self.router.db_for_read(Post), 'default')
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+
+    def test_read_your_writes(self):
+        response = self.request(self.read_view)
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        # после записи чтение в том же запросе и кука на 5 секунд
+        response = self.request(self.write_view)
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(
+            response.cookies[routers.PIN_COOKIE]['max-age'], 5)
+        response = self.request(
+            self.read_view, **{routers.PIN_COOKIE: '1'})
+        self.assertEqual(response.content, b'default')
+        # вне запросов - только основная база
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_without_replicas(self):
+        self.assertEqual(self.router.db_for_read(Post), 'default')
+        response = self.request(self.write_view)
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
@@ -0,0 +1,98 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Post
+from ..search import build_match
+from ..views import LIMIT_POSTS
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'поиск на SQLite FTS5')
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', is_staff=True, is_superuser=True)
+        # более релевантный пост старше: порядок не по дате
+        cls.twice = Post.objects.create(
+            author=cls.author, text='Дождь, снова дождь и ветер')
+        cls.once = Post.objects.create(
+            author=cls.author, text='Сегодня был дождь')
+        cls.other = Post.objects.create(
+            author=cls.author, text='Солнечный день')
+
+    def setUp(self):
+        self.client = Client()
+
+    def search(self, query):
+        return list(Post.objects.search(query))
+
+    def test_build_match(self):
+        self.assertEqual(build_match('привет мир'), '"привет" "мир"')
+        self.assertEqual(build_match('прив*'), '"прив"*')
+        # операторы FTS5 из запроса не проходят
+        self.assertEqual(build_match('a OR "b" -c'), '"a" "OR" "b" "c"')
+        self.assertEqual(build_match(' ?! '), '')
+
+    def test_ranked_by_bm25(self):
+        self.assertEqual(self.search('дождь'), [self.twice, self.once])
+
+    def test_prefix_and_case(self):
+        self.assertEqual(self.search('ДОЖ*'), [self.twice, self.once])
+        self.assertEqual(self.search('солн*'), [self.other])
+        self.assertEqual(self.search('солн'), [])
+
+    def test_index_follows_post_changes(self):
+        Post.objects.filter(pk=self.other.pk).update(text='Туман')
+        Post.objects.bulk_create([Post(author=self.author, text='Туман')])
+        self.assertEqual(len(self.search('туман')), 2)
+        self.assertEqual(self.search('солнечный'), [])
+        Post.objects.filter(text='Туман').delete()
+        self.assertEqual(self.search('туман'), [])
+
+    def test_search_page(self):
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Дождь номер {i}')
+            for i in range(LIMIT_POSTS)
+        )
+        url = reverse('posts:search')
+        response = self.client.get(url, {'q': 'дождь'})
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, LIMIT_POSTS + 2)
+        self.assertEqual(page_obj[0], self.twice)
+        # ссылка на следующую страницу сохраняет запрос
+        self.assertContains(response, '?q=%D0%B4%D0%BE%D0%B6%D0%B4%D1%8C&amp;')
+        cursor = page_obj.paginator.encode_cursor(page_obj[-1], 'n')
+        response = self.client.get(url, {'q': 'дождь', 'cursor': cursor})
+        seen = set(page_obj) | set(response.context['page_obj'])
+        self.assertEqual(len(seen), LIMIT_POSTS + 2)
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+
+    def test_admin_search(self):
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'солн*'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.other])
+
+    def test_rebuild_command(self):
+        with connection.cursor() as cursor:
+            cursor.execute("INSERT INTO posts_post_fts(posts_post_fts) "
+                           "VALUES ('delete-all')")
+        self.assertEqual(self.search('дождь'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.search('дождь'), [self.twice, self.once])
@@ -0,0 +1,35 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from ..models import AuthorStats, Comment, Follow, Post, TimelineEntry
+
+
+class SeedCommandTest(TestCase):
+    def test_seed(self):
+        call_command(
+            'seed_yatube', users=50, groups=3, posts=300, comments=200,
+            follows=100, seed=1, stdout=StringIO()
+        )
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Follow.objects.count(), 100)
+        # comment_count сходится с таблицей комментариев
+        self.assertEqual(
+            Post.objects.aggregate(total=Sum('comment_count'))['total'],
+            Comment.objects.count()
+        )
+        # по Ципфу самый активный автор пишет заметно больше медианного
+        per_author = list(Post.objects.values('author').annotate(
+            total=Count('id')).order_by('-total').values_list(
+                'total', flat=True))
+        self.assertGreater(per_author[0], 5 * per_author[len(per_author) // 2])
+        top = AuthorStats.objects.order_by('-followers_count').first()
+        self.assertEqual(
+            top.followers_count,
+            Follow.objects.filter(author_id=top.user_id).count())
+        self.assertTrue(TimelineEntry.objects.exists())
+        # даты разбросаны, а не проставлены auto_now_add
+        dates = Post.objects.values_list('pub_date', flat=True)
+        self.assertGreater((max(dates) - min(dates)).days, 30)
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from core.auth import CachedModelBackend, user_key
+
+User = get_user_model()
+
+
+class CachedAuthTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='reader', password='old-password-123')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_warm_request_without_queries(self):
+        url = reverse('posts:index')
+        self.client.get(url)
+        # сессия, пользователь и страница - из кэша
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Пользователь: reader')
+
+    def test_sessions_of_model_backend_stay_logged_in(self):
+        """Сессии, открытые до перехода на CachedModelBackend,
+        не разлогиниваются."""
+        old = Client()
+        old.force_login(
+            self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = old.get(reverse('posts:post_create'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_edit_invalidates_user(self):
+        backend = CachedModelBackend()
+        self.assertEqual(backend.get_user(self.user.pk).first_name, '')
+        self.assertIsNotNone(cache.get(user_key(self.user.pk)))
+        self.user.first_name = 'Лев'
+        self.user.save()
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        self.assertEqual(backend.get_user(self.user.pk).first_name, 'Лев')
+
+    def test_logout_forgets_session_and_user(self):
+        self.client.get(reverse('posts:index'))
+        session_key = self.client.session.session_key
+        self.client.get(reverse('users:logout'))
+        self.assertIsNone(cache.get(user_key(self.user.pk)))
+        self.assertFalse(
+            Session.objects.filter(session_key=session_key).exists())
+        response = self.client.get(reverse('posts:post_create'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.get(reverse('posts:index'))
+        other = Client()
+        other.force_login(self.user)
+        response = other.post(reverse('password_change'), {
+            'old_password': 'old-password-123',
+            'new_password1': 'new-password-456',
+            'new_password2': 'new-password-456',
+        })
+        self.assertEqual(response.status_code, 302)
+        # сменивший пароль остается в системе, остальные сессии - нет
+        self.assertEqual(
+            other.get(reverse('posts:post_create')).status_code, 200)
+        self.assertEqual(
+            self.client.get(reverse('posts:post_create')).status_code, 302)
+
+
+class ClearExpiredSessionsTest(TestCase):
+    def test_deletes_only_expired_in_batches(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'expired{i}', session_data='',
+                expire_date=now - timedelta(days=1))
+        Session.objects.create(
+            session_key='alive', session_data='',
+            expire_date=now + timedelta(days=1))
+        out = StringIO()
+        # три пачки: SELECT ключей и DELETE по ним
+        with self.assertNumQueries(6):
+            call_command(
+                'clear_expired_sessions', batch_size=2, pause=0, stdout=out)
+        self.assertIn('Удалено сессий: 5', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['alive'])
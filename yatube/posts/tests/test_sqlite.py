@@ -0,0 +1,102 @@
+import os
+import tempfile
+import threading
+import time
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase
+
+from core.sqlite.base import DatabaseWrapper
+
+THREADS = 4
+ITERATIONS = 40
+
+
+def run_workload(options, path):
+    """Потоки вперемешку читают и пишут (транзакция читает, потом
+    пишет). Возвращает (успешные операции в секунду, ошибки)."""
+    settings_dict = dict(
+        connection.settings_dict, NAME=path, OPTIONS=options)
+    setup = DatabaseWrapper(settings_dict)
+    with setup.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS bench')
+        cursor.execute(
+            'CREATE TABLE bench (id INTEGER PRIMARY KEY, value TEXT)')
+    setup.close()
+    done, errors = [], []
+
+    def worker(number):
+        db = DatabaseWrapper(settings_dict)
+        for i in range(ITERATIONS):
+            try:
+                if i % 2:
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*), MAX(id) FROM bench')
+                        cursor.fetchone()
+                else:
+                    # как transaction.atomic
+                    db.set_autocommit(
+                        False,
+                        force_begin_transaction_with_broken_autocommit=True)
+                    try:
+                        with db.cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*) FROM bench')
+                            count = cursor.fetchone()[0]
+                            time.sleep(0.001)
+                            cursor.execute(
+                                'INSERT INTO bench (value) VALUES (%s)',
+                                [f'{number}-{count}'])
+                        db.commit()
+                    except Exception:
+                        db.rollback()
+                        raise
+                    finally:
+                        db.set_autocommit(True)
+                done.append(i)
+            except OperationalError as error:
+                errors.append(error)
+        db.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(number,))
+        for number in range(THREADS)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(done) / (time.perf_counter() - started), len(errors)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'настройки SQLite')
+class SQLiteConcurrencyTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'db.sqlite3')
+
+    def test_tuned_throughput(self):
+        plain = run_workload({}, self.path + '.plain')
+        tuned = run_workload(
+            settings.DATABASES['default']['OPTIONS'], self.path)
+        # без очереди записи транзакции, начавшие с чтения,
+        # не могут перейти к записи и падают с database is locked
+        self.assertGreater(plain[1], 0)
+        self.assertEqual(tuned[1], 0)
+        self.assertGreater(tuned[0], plain[0])
+
+    def test_pragmas(self):
+        db = DatabaseWrapper(dict(
+            connection.settings_dict, NAME=self.path,
+            OPTIONS=settings.DATABASES['default']['OPTIONS']))
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            # NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+        db.close()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.test import SimpleTestCase
+
+from core.sqlite_cache import CULL_CHECK_EVERY, SQLiteCache
+
+
+def make_cache(path, **options):
+    return SQLiteCache(path, {'OPTIONS': options})
+
+
+def increment(path, times):
+    cache = make_cache(path)
+    for _ in range(times):
+        cache.incr('counter')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = make_cache(self.path)
+
+    def test_basic_operations(self):
+        cache = self.cache
+        cache.set('page', {'html': '<p>'})
+        cache.set('flag', True)
+        self.assertEqual(cache.get('page'), {'html': '<p>'})
+        self.assertIs(cache.get('flag'), True)
+        self.assertIsNone(cache.get('missing'))
+        self.assertFalse(cache.add('page', 'other'))
+        self.assertTrue(cache.add('new', 1))
+        self.assertEqual(
+            cache.get_many(['page', 'new', 'missing']),
+            {'page': {'html': '<p>'}, 'new': 1})
+        cache.delete_many(['page', 'new'])
+        self.assertFalse(cache.has_key('page'))
+        self.assertEqual(cache.get_or_set('lazy', lambda: 5), 5)
+        cache.clear()
+        self.assertIsNone(cache.get('lazy'))
+
+    def test_incr(self):
+        self.cache.set('version', 10, None)
+        self.assertEqual(self.cache.incr('version'), 11)
+        self.assertEqual(self.cache.decr('version', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expiry(self):
+        self.cache.set('short', 'value', 0.05)
+        self.cache.set('forever', 'value', None)
+        self.assertTrue(self.cache.has_key('short'))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        # просроченный ключ можно занять через add
+        self.assertTrue(self.cache.add('short', 'again'))
+        self.assertEqual(self.cache.get('forever'), 'value')
+
+    def test_shared_between_instances(self):
+        other = make_cache(self.path)
+        self.cache.set('feed_version:index', 1, None)
+        other.incr('feed_version:index')
+        self.assertEqual(self.cache.get('feed_version:index'), 2)
+
+    def test_incr_is_atomic_across_processes(self):
+        self.cache.set('counter', 0, None)
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            list(pool.map(increment, [self.path] * 4, [100] * 4))
+        self.assertEqual(self.cache.get('counter'), 400)
+
+    def test_cull_drops_least_recently_used(self):
+        cache = make_cache(self.path, MAX_ENTRIES=50, CULL_FREQUENCY=2)
+        cache.set('old', 'value')
+        cache.set_many({f'key{i}': i for i in range(CULL_CHECK_EVERY)})
+        cache.db.execute("UPDATE cache SET accessed = 0 WHERE key LIKE "
+                         "'%old'")
+        cache.set_many({f'more{i}': i for i in range(CULL_CHECK_EVERY)})
+        count = cache.db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        self.assertLess(count, 2 * CULL_CHECK_EVERY)
+        self.assertIsNone(cache.get('old'))
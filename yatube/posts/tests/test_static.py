@@ -0,0 +1,115 @@
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import skipIf
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import staticfiles
+
+TEMP_STATIC_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CSS = 'css/bootstrap.min.css'
+
+
+@override_settings(STATIC_ROOT=TEMP_STATIC_ROOT)
+class StaticFilesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(os.path.join(settings.STATICFILES_DIRS[0], CSS), 'rb') as f:
+            cls.original = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_STATIC_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = staticfiles_storage.url(CSS)
+
+    def test_pages_link_hashed_names(self):
+        self.assertRegex(self.url, r'bootstrap\.min\.[0-9a-f]{12}\.css$')
+        self.assertContains(self.client.get(reverse('posts:index')), self.url)
+
+    def test_gzip_variant(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response.status_code, 200)
+        expected = 'br' if staticfiles.brotli else 'gzip'
+        self.assertEqual(response['Content-Encoding'], expected)
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        if expected == 'gzip':
+            self.assertEqual(
+                gzip.decompress(b''.join(response.streaming_content)),
+                self.original)
+
+    @skipIf(staticfiles.brotli is None, 'нет пакета brotli')
+    def test_brotli_variant(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(
+            staticfiles.brotli.decompress(
+                b''.join(response.streaming_content)),
+            self.original)
+
+    def test_identity(self):
+        for header in ('', 'gzip;q=0, identity', 'deflate'):
+            with self.subTest(accept_encoding=header):
+                response = self.client.get(
+                    self.url, HTTP_ACCEPT_ENCODING=header)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(
+                    b''.join(response.streaming_content), self.original)
+
+    def test_ranges(self):
+        size = len(self.original)
+        ranges = {
+            'bytes=0-9': (0, 9),
+            'bytes=100-': (100, size - 1),
+            'bytes=-10': (size - 10, size - 1),
+        }
+        for header, (start, end) in ranges.items():
+            with self.subTest(range=header):
+                response = self.client.get(
+                    self.url, HTTP_RANGE=header, HTTP_ACCEPT_ENCODING='gzip')
+                self.assertEqual(response.status_code, 206)
+                self.assertFalse(response.has_header('Content-Encoding'))
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/{size}')
+                body = b''.join(response.streaming_content)
+                self.assertEqual(int(response['Content-Length']), len(body))
+                self.assertEqual(body, self.original[start:end + 1])
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+
+    def test_not_modified(self):
+        response = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_outside_static_root(self):
+        self.assertIsNone(staticfiles.find(TEMP_STATIC_ROOT, '../manage.py'))
+        self.assertIsNone(staticfiles.find(TEMP_STATIC_ROOT, 'css/none.css'))
+
+    def test_compressed_variant_not_served_directly(self):
+        for suffix in staticfiles.ENCODINGS.values():
+            path = staticfiles_storage.path(
+                staticfiles_storage.stored_name(CSS)) + suffix
+            if not os.path.isfile(path):
+                continue
+            with self.subTest(suffix=suffix):
+                response = self.client.get(
+                    self.url + suffix, HTTP_ACCEPT_ENCODING='gzip, br')
+                self.assertEqual(response.status_code, 404)
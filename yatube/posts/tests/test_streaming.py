@@ -0,0 +1,53 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core.streaming import STREAM_BATCH
+
+from ..models import Post
+
+User = get_user_model()
+
+
+@skipUnless(connection.vendor == 'sqlite', 'поиск на SQLite FTS5')
+class StreamingSearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Дождь номер {i}')
+            for i in range(STREAM_BATCH + 2)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_head_sent_before_queries(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'дождь'})
+        self.assertTrue(response.streaming)
+        chunks = iter(response.streaming_content)
+        with self.assertNumQueries(0):
+            head = next(chunks)
+        self.assertIn(b'<form', head)
+        self.assertNotIn('Дождь номер'.encode(), head)
+        # COUNT, затем страница одним курсором
+        with self.assertNumQueries(2):
+            body = b''.join(chunks).decode()
+        self.assertEqual(body.count('Дождь номер'), STREAM_BATCH + 2)
+        page_obj = response.context['page_obj']
+        self.assertIsInstance(page_obj.object_list, list)
+        self.assertEqual(len(page_obj), STREAM_BATCH + 2)
+
+    def test_nothing_found(self):
+        response = self.client.get(reverse('posts:search'), {'q': 'снег'})
+        self.assertContains(response, 'Ничего не найдено.')
+
+    def test_empty_query(self):
+        response = self.client.get(reverse('posts:search'))
+        self.assertNotContains(response, 'Ничего не найдено.')
@@ -1,3 +1,4 @@
+import os
 import shutil
 import tempfile
 
@@ -10,8 +11,10 @@ from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.core.cache import cache
+from django.db import connection
 
-from ..models import Group, Post
+from ..models import Follow, Group, Post
+from ..thumbnails import build_thumbnails
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -180,20 +183,160 @@ class PostPagesTests(TestCase):
         )
         response = self.authorized_client.get(
             reverse('posts:index')
-        ).content
-        post.delete()
-
+        )
         response_cashed = self.authorized_client.get(
             reverse('posts:index')
-        ).content
-        # закашерировано, шуд игнор делишн
-        self.assertEqual(response_cashed, response)
-        # очистим, чтобы не обращалось к кэшу
-        cache.clear()
-
+        )
+        # ничего не менялось - страница отдана из кэша без рендера
+        self.assertIsNone(response_cashed.context)
+        self.assertEqual(response_cashed.content, response.content)
+        post.delete()
+        # удаление поднимает версию ленты, кэш чистить не нужно
         non_cashed_response = self.authorized_client.get(
             reverse('posts:index')
-        ).content
+        )
+        self.assertIsNotNone(non_cashed_response.context)
+        self.assertNotEqual(non_cashed_response.content, response.content)
+
+    def test_cache_is_per_feed(self):
+        """Новый пост сбрасывает только ленты, в которых он виден."""
+        other = User.objects.create_user(username='other')
+        urls = {
+            reverse('posts:index'): True,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}):
+                True,
+            reverse('posts:group_list', kwargs={'slug': self.group2.slug}):
+                False,
+            reverse('posts:profile', kwargs={'username': self.user}): True,
+            reverse('posts:profile', kwargs={'username': other}): False,
+        }
+        for url in urls:
+            self.authorized_client.get(url)
+        Post.objects.create(
+            text='Новый пост', author=self.user, group=self.group)
+        for url, rendered in urls.items():
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.context is not None, rendered)
+
+    def test_profile_lookup_follows_renames(self):
+        """id автора по username в кэше сбрасывается при
+        переименовании и удалении."""
+        def profile(username):
+            return self.client.get(
+                reverse('posts:profile', kwargs={'username': username}))
+        gone = User.objects.create_user(username='gone')
+        Post.objects.create(text='Пост ушедшего', author=gone)
+        self.assertContains(profile('gone'), 'Пост ушедшего')
+        gone.delete()
+        reused = User.objects.create_user(username='gone')
+        Post.objects.create(text='Пост нового', author=reused)
+        response = profile('gone')
+        self.assertContains(response, 'Пост нового')
+        self.assertNotContains(response, 'Пост ушедшего')
+        reused.username = 'renamed'
+        reused.save()
+        self.assertEqual(profile('gone').status_code, 404)
+        self.assertContains(profile('renamed'), 'Пост нового')
 
-        self.assertNotEqual(non_cashed_response, response)
-        self.assertNotEqual(non_cashed_response, response_cashed)
+    def test_post_cards_are_cached(self):
+        """Карточка поста рендерится один раз на все ленты и
+        перестраивается после правки поста или имени автора."""
+        card = 'includes/posts_details.html'
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, card)
+        response = self.authorized_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}))
+        self.assertTemplateNotUsed(response, card)
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertTemplateUsed(response, card)
+        self.assertContains(response, 'Новое имя')
+
+    def test_renames_refresh_cached_pages(self):
+        """Новые имя автора и адрес группы видны на всех
+        закэшированных страницах с их постами."""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        follower_client = Client()
+        follower_client.force_login(follower)
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group.slug})
+        urls = (
+            reverse('posts:index'),
+            group_url,
+            reverse('posts:profile', kwargs={'username': self.user}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:follow_index'),
+        )
+
+        def pages():
+            for url in urls:
+                yield url, follower_client.get(url)
+        list(pages())
+        author = User.objects.get(pk=self.user.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        for url, response in pages():
+            with self.subTest(url=url):
+                self.assertContains(response, 'Новое имя')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'new-slug'
+        group.save()
+        new_url = reverse('posts:group_list', kwargs={'slug': 'new-slug'})
+        for url, response in pages():
+            if url != group_url:
+                with self.subTest(url=url):
+                    self.assertContains(response, new_url)
+
+    def test_deleted_group_not_linked(self):
+        """После удаления группы страницы не ссылаются на нее."""
+        group = Group.objects.create(title='Временная', slug='temporary')
+        Post.objects.create(text='Пост группы', author=self.user, group=group)
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        group_url = reverse('posts:group_list', kwargs={'slug': 'temporary'})
+        for url in urls:
+            self.assertContains(self.client.get(url), group_url)
+        group.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), group_url)
+
+    def test_thumbnails_built_on_commit_in_tests(self):
+        """В тестах миниатюры собираются сразу после коммита,
+        без пула процессов."""
+        self.assertFalse(settings.POST_THUMBNAILS_ASYNC)
+        post = Post.objects.create(
+            text='С картинкой', author=self.user,
+            image=SimpleUploadedFile(
+                'commit.gif', self.post.image.open('rb').read(),
+                content_type='image/gif'))
+        # TestCase не коммитит: выполняем отложенное on_commit сами
+        for _, callback in connection.run_on_commit:
+            callback()
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnails)
+        for variants in post.thumbnail_variants.values():
+            for _, name in variants:
+                with self.subTest(name=name):
+                    self.assertTrue(
+                        os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+
+    def test_thumbnails_in_srcset(self):
+        """Готовые миниатюры выводятся через srcset."""
+        names = build_thumbnails(self.post)
+        for variants in names.values():
+            for _, name in variants:
+                with self.subTest(name=name):
+                    self.assertTrue(
+                        os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}))
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, '_960.webp 960w')
+        self.assertContains(response, '_320.jpeg 320w')
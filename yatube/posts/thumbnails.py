@@ -0,0 +1,139 @@
+"""Миниатюры картинок постов готовятся заранее, при сохранении поста,
+в отдельных процессах. Шаблоны берут готовые пути из Post.thumbnails
+и выводят srcset, не обращаясь к Pillow или sorl-thumbnail."""
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# та же обрезка, что была у {% thumbnail post.image "960x339" %}
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_WIDTHS = (320, 640, 960)
+# порядок важен: в <picture> первым идет формат поменьше
+THUMBNAIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_QUALITY: int = 85
+THUMBNAIL_WORKERS: int = 2
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS)
+    return _executor
+
+
+def thumbnail_names(image_name):
+    """{'webp': [[320, 'thumbs/posts/a_320.webp'], ...], 'jpeg': ...}"""
+    stem = os.path.splitext(image_name)[0]
+    return {
+        fmt: [
+            [width, f'{THUMBNAIL_DIR}/{stem}_{width}.{fmt}']
+            for width in THUMBNAIL_WIDTHS
+        ]
+        for fmt in THUMBNAIL_FORMATS
+    }
+
+
+def make_thumbnail_dirs(media_root, names):
+    """Каталоги создаются заранее, в вызывающем процессе: воркер
+    пула пишет только в существующие и не воссоздает MEDIA_ROOT,
+    если его успели удалить (например, временный каталог тестов)."""
+    for variants in names.values():
+        for _, name in variants:
+            os.makedirs(
+                os.path.dirname(os.path.join(media_root, name)),
+                exist_ok=True)
+
+
+def render_thumbnails(source, media_root, names):
+    """Выполняется в процессе пула: только Pillow, без ORM."""
+    width, height = THUMBNAIL_SIZE
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image).convert('RGB')
+        for fmt, variants in names.items():
+            for thumb_width, name in variants:
+                size = (thumb_width, round(thumb_width * height / width))
+                # fit обрезает по центру и растягивает маленькие
+                # картинки, как crop="center" upscale=True
+                thumb = ImageOps.fit(image, size, Image.LANCZOS)
+                thumb.save(
+                    os.path.join(media_root, name),
+                    THUMBNAIL_FORMATS[fmt], quality=THUMBNAIL_QUALITY)
+    return names
+
+
+def save_thumbnails(post_id, image_name, names):
+    from .models import Post
+    # картинку могли заменить, пока готовились миниатюры старой;
+    # updated_at сбрасывает закэшированную карточку поста
+    Post.objects.filter(pk=post_id, image=image_name).update(
+        thumbnails=json.dumps(names), updated_at=timezone.now())
+
+
+def build_thumbnails(post):
+    """Синхронная сборка - для команды build_thumbnails и тестов."""
+    names = thumbnail_names(post.image.name)
+    make_thumbnail_dirs(settings.MEDIA_ROOT, names)
+    names = render_thumbnails(post.image.path, settings.MEDIA_ROOT, names)
+    save_thumbnails(post.pk, post.image.name, names)
+    return names
+
+
+def _thumbnails_done(post_id, image_name, future):
+    try:
+        save_thumbnails(post_id, image_name, future.result())
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s',
+                         post_id)
+    finally:
+        # колбэк идет в служебном потоке пула, его соединение
+        # никто, кроме нас, не закроет
+        connection.close()
+
+
+def schedule_thumbnails(post):
+    """Отправляет картинку поста в пул после коммита транзакции
+    (при POST_THUMBNAILS_ASYNC = False - собирает сразу)."""
+    post_id, image_name = post.pk, post.image.name
+
+    def submit():
+        try:
+            source = post.image.path
+        except Exception:
+            # хранилище без локальных путей или путь вне MEDIA_ROOT
+            logger.warning('Нет пути к картинке поста %s', post_id)
+            return
+        if not os.path.exists(source):
+            return
+        if not settings.POST_THUMBNAILS_ASYNC:
+            build_thumbnails(post)
+            return
+        names = thumbnail_names(image_name)
+        make_thumbnail_dirs(settings.MEDIA_ROOT, names)
+        future = get_executor().submit(
+            render_thumbnails, source, settings.MEDIA_ROOT, names)
+        future.add_done_callback(
+            partial(_thumbnails_done, post_id, image_name))
+    transaction.on_commit(submit)
+
+
+def delete_thumbnails(thumbnails):
+    try:
+        thumbnails = json.loads(thumbnails or '{}')
+    except ValueError:
+        return
+    for variants in thumbnails.values():
+        for _, name in variants:
+            default_storage.delete(name)
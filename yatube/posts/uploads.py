@@ -0,0 +1,127 @@
+"""Прием картинок постов. Файл к этому моменту уже лежит на диске
+(см. FILE_UPLOAD_HANDLERS): по заголовку проверяются формат и размер,
+большие картинки уменьшаются, а метаданные (EXIF с геометками и т.п.)
+отбрасываются пересохранением пикселей. Одинаковые загрузки
+узнаются по sha256 и хранятся одним файлом."""
+import hashlib
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import InMemoryUploadedFile
+from PIL import Image, ImageOps
+
+from .models import Post
+
+# формат Pillow -> допустимые расширения (первое - основное)
+# и параметры пересохранения
+IMAGE_FORMATS = {
+    'JPEG': (('jpg', 'jpeg'), {'quality': 90, 'optimize': True}),
+    'PNG': (('png',), {'optimize': True}),
+    'GIF': (('gif',), {}),
+    'WEBP': (('webp',), {'quality': 90}),
+}
+# что из Image.info переносится в новый файл: цветовой профиль
+# и прозрачность палитры нужны для отображения, остальное - нет
+KEPT_INFO = ('icc_profile', 'transparency')
+
+
+def content_hash(upload):
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def find_duplicate(digest):
+    """Имя уже сохраненного файла с тем же содержимым."""
+    name = Post.objects.filter(image_hash=digest).exclude(
+        image='').values_list('image', flat=True).first()
+    if name and default_storage.exists(name):
+        return name
+    return None
+
+
+def open_header(upload):
+    """Pillow открывает файл лениво: читается только заголовок,
+    пиксели не декодируются."""
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Exception:
+        image = None
+    if image is None or image.format not in IMAGE_FORMATS:
+        raise ValidationError(
+            'Загрузите картинку в формате JPEG, PNG, GIF или WebP.',
+            code='invalid_image'
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        image.close()
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height}
+        )
+    return image
+
+
+def file_name(name, fmt):
+    stem, ext = os.path.splitext(os.path.basename(name))
+    extensions = IMAGE_FORMATS[fmt][0]
+    if ext[1:].lower() in extensions:
+        return stem + ext
+    return f'{stem}.{extensions[0]}'
+
+
+def normalize(image, name):
+    """Новый файл без метаданных, не больше POST_IMAGE_MAX_SIDE
+    по длинной стороне. None - оставить файл как есть."""
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    if getattr(image, 'is_animated', False):
+        # кадры анимации по одному не пересобираем
+        if max(image.size) > max_side:
+            raise ValidationError(
+                'Анимация больше %(side)s px по длинной стороне.',
+                code='animation_too_large',
+                params={'side': max_side}
+            )
+        return None
+    fmt = image.format
+    kept = {key: image.info[key] for key in KEPT_INFO if key in image.info}
+    # JPEG сразу декодируется в уменьшенном масштабе (1/2 ... 1/8)
+    image.draft(image.mode, (max_side, max_side))
+    # поворот по EXIF переносится в пиксели, раз сам EXIF пропадет
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    # метаданные берутся при сохранении только из параметров save()
+    image.info = {}
+    # после уменьшения файл не больше POST_IMAGE_MAX_SIDE по стороне,
+    # в памяти: временный файл на диске пришлось бы закрывать вручную
+    output = BytesIO()
+    image.save(output, fmt, **IMAGE_FORMATS[fmt][1], **kept)
+    size = output.tell()
+    output.seek(0)
+    return InMemoryUploadedFile(
+        output, 'image', file_name(name, fmt), Image.MIME[fmt], size, None)
+
+
+def ingest_image(upload):
+    """(файл для сохранения или имя уже сохраненного, sha256)."""
+    max_size = settings.POST_IMAGE_MAX_UPLOAD_SIZE
+    if upload.size > max_size:
+        raise ValidationError(
+            'Файл больше %(size)s МБ.',
+            code='file_too_large',
+            params={'size': max_size // (1024 * 1024)}
+        )
+    digest = content_hash(upload)
+    duplicate = find_duplicate(digest)
+    if duplicate is not None:
+        return duplicate, digest
+    with open_header(upload) as image:
+        normalized = normalize(image, upload.name)
+    upload.seek(0)
+    return normalized or upload, digest
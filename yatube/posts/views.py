@@ -1,31 +1,58 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect
-from django.views.decorators.cache import cache_page
+from django.http import HttpResponseBadRequest
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 
+from core.paginators import CursorPaginator, InvalidCursor, paginate
+from core.streaming import stream_render
+
+from .counters import AUTHOR, FOLLOW, GROUP, INDEX, feed_count_key
+from .feed_cache import POPULAR, POST, cache_feed, cached_lookup
 from .forms import PostForm, CommentForm
-from .models import Group, Post, Follow
+from .models import AuthorStats, Group, Post, Follow, TimelineEntry
 
 LIMIT_POSTS: int = 10
+LIMIT_COMMENTS: int = 20
 
 User = get_user_model()
 
 
+def group_feeds(request, slug):
+    group_id = cached_lookup(Group, 'pk', slug=slug)
+    return None if group_id is None else [(GROUP, group_id)]
+
+
+def profile_feeds(request, username):
+    author_id = cached_lookup(User, 'pk', username=username)
+    return None if author_id is None else [(AUTHOR, author_id)]
+
+
+def post_feeds(request, post_id):
+    author_id = cached_lookup(Post, 'author_id', pk=post_id)
+    if author_id is None:
+        return None
+    return [(POST, post_id), (AUTHOR, author_id)]
+
+
+def follow_feeds(request):
+    return [(FOLLOW, request.user.pk), (POPULAR, None)]
+
+
 # Главная страница
-@cache_page(20, key_prefix="index_page")
+@cache_feed(lambda request: [(INDEX, None)])
 def index(request):
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     # Если порядок сортировки определен в классе Meta модели,
     # запрос будет выглядить так:
     # post_list = Post.objects.all()
     # Показывать по 10 записей на странице.
-    paginator = Paginator(posts, LIMIT_POSTS)
-    # Из URL извлекаем номер запрошенной страницы - это значение параметра page
-    page_number = request.GET.get('page')
-    # Получаем набор записей для страницы с запрошенным номером
-    page_obj = paginator.get_page(page_number)
+    # Из URL извлекаем курсор (?cursor=) или номер страницы (?page=)
+    # и получаем набор записей для запрошенной страницы
+    page_obj = paginate(
+        request, posts, LIMIT_POSTS, count_key=feed_count_key(INDEX))
     # Отдаем в словаре контекста
     context = {
         'page_obj': page_obj,
@@ -33,12 +60,12 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@cache_feed(group_feeds)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = group.posts.for_feed()
+    page_obj = paginate(
+        request, posts, LIMIT_POSTS, count_key=feed_count_key(GROUP, group.id))
     context = {
         'group': group,
         'page_obj': page_obj,
@@ -46,29 +73,70 @@ def group_posts(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+def search(request):
+    """Поиск по тексту постов через FTS5 (см. posts.search),
+    сначала самые релевантные. Страница не кэшируется и отдается
+    потоком (core.streaming): шапка уходит до запроса к индексу."""
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        page_obj = SimpleLazyObject(lambda: paginate(
+            request, Post.objects.for_feed().search(query), LIMIT_POSTS,
+            keys=('score', 'id')
+        ))
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        # ссылки паджинатора сохраняют запрос
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    return stream_render(
+        request, 'posts/search.html', context,
+        'includes/posts_details.html', 'includes/search_footer.html')
+
+
+@cache_feed(profile_feeds)
 def profile(request, username):
     author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = request.user.is_authenticated
-    if following:
-        following = author.following.filter(user=request.user).exists()
+    posts = author.posts.for_feed()
+    page_obj = paginate(
+        request, posts, LIMIT_POSTS,
+        count_key=feed_count_key(AUTHOR, author.id)
+    )
+    # кнопка подписки - в posts.fragments
     context = {
         'author': author,
+        'author_stats': AuthorStats.objects.for_user(author),
         'page_obj': page_obj,
-        'following': following
     }
     return render(request, 'posts/profile.html', context)
 
 
+def comment_page(post, cursor=None):
+    """Комментарии поста от новых к старым, страница по курсору
+    (created, id); авторы приходят тем же запросом."""
+    comments = post.comments.select_related('author').only(
+        'text', 'created', 'post_id', 'author__username')
+    paginator = CursorPaginator(
+        comments, LIMIT_COMMENTS, keys=('created', 'id'))
+    if cursor:
+        return paginator.cursor_page(cursor)
+    return paginator.first_page()
+
+
+@cache_feed(post_feeds)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), id=post_id)
     form = CommentForm()
-    comments = post.comments.all()
+    # ?comments= - страница комментариев без JavaScript
+    try:
+        comments = comment_page(post, request.GET.get('comments'))
+    except InvalidCursor:
+        comments = comment_page(post)
     context = {
         'post': post,
+        'author_stats': AuthorStats.objects.for_user(post.author),
         'comments': comments,
         'form': form
         # delete or include?
@@ -76,6 +144,22 @@ def post_detail(request, post_id):
     return render(request, 'includes/post_detail.html', context)
 
 
+@cache_feed(lambda request, post_id: [(POST, post_id)])
+def post_comments(request, post_id):
+    """Фрагмент HTML со следующей страницей комментариев
+    для кнопки "Показать ещё"."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    try:
+        comments = comment_page(post, request.GET.get('cursor'))
+    except InvalidCursor:
+        return HttpResponseBadRequest()
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -130,24 +214,33 @@ def add_comment(request, post_id):
 
 
 @login_required
+@cache_feed(follow_feeds, shared=False)
 def follow_index(request):
-    """thank you, stackOverflow!:
-мы имеем связь между объектами (а точнее таблицами в БД).
-Post -> Author <-> Follow <-> User. Сначала ищется
-пользователь с заданным именем. Для него ищутся объекты
-в таблице Follow, которые на него ссылаются.
-Далее для всех найденных записей в Follow ищутся
-связанные с ними авторы. А далее все посты,
-которые связанны с найденными авторами.
-На уровне БД и SQL делается join всех этих таблиц
-и фильтрация по идентификатору пользователя, который
-берется из request.user."""
-    posts = Post.objects.filter(
-        author__following__user=request.user)
-    paginator = Paginator(posts, LIMIT_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    context = {'page_obj': page_obj}
+    """Лента подписок читается из TimelineEntry: пост раскладывается
+    по лентам подписчиков при публикации (см. posts.signals), поэтому
+    вместо join Post -> Author <-> Follow <-> User здесь один проход
+    по индексу (user, pub_date, post). Посты популярных авторов
+    в ленты не раскладываются и добавляются к ней запросом
+    (TimelineEntry.objects.merged_feed) - чтение ничего не пишет."""
+    count_key = feed_count_key(FOLLOW, request.user.id)
+    popular = TimelineEntry.objects.popular(request.user)
+    if popular:
+        page_obj = paginate(
+            request, TimelineEntry.objects.merged_feed(
+                request.user, popular),
+            LIMIT_POSTS, count_key=count_key
+        )
+        posts = list(page_obj)
+    else:
+        page_obj = paginate(
+            request, TimelineEntry.objects.feed(request.user), LIMIT_POSTS,
+            keys=('pub_date', 'post_id'), count_key=count_key
+        )
+        posts = [entry.post for entry in page_obj]
+    context = {
+        'page_obj': page_obj,
+        'posts': posts,
+    }
     return render(request, 'posts/follow.html', context)
 
 
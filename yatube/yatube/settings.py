@@ -11,12 +11,17 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import sys
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 STATIC_URL = '/static/'
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
+# collectstatic: имена с хешем и сжатые копии, отдает
+# core.middleware.StaticFilesMiddleware (см. core/staticfiles.py)
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.staticfiles.CompressedManifestStorage'
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -55,6 +60,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.StaticFilesMiddleware',
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -96,11 +104,50 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        # django.db.backends.sqlite3 с прагмами, повтором при
+        # блокировке и очередью записи (см. core/sqlite/base.py)
+        'ENGINE': 'core.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # соединение живет между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': {
+                # читатели не мешают писателю и наоборот
+                'journal_mode': 'wal',
+                # в режиме WAL fsync только при checkpoint
+                'synchronous': 'normal',
+                'mmap_size': 256 * 1024 * 1024,
+                # отрицательное значение - в КиБ: 64 МиБ
+                'cache_size': -64 * 1024,
+                'busy_timeout': 5000,
+                'temp_store': 'memory',
+            },
+            'serialize_writes': True,
+            'lock_retries': 5,
+        },
     }
 }
 
+# Реплика для чтения лент и постов: путь к копии базы в
+# YATUBE_REPLICA_DB, локально копию обновляет manage.py sync_replica
+REPLICA_DB = os.environ.get('YATUBE_REPLICA_DB')
+if REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': REPLICA_DB,
+        'OPTIONS': {
+            **DATABASES['default']['OPTIONS'],
+            'serialize_writes': False,
+        },
+        # в тестах реплика - та же база
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# сколько секунд после записи пользователь читает из основной базы
+REPLICA_PIN_SECONDS = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -138,6 +185,18 @@ USE_TZ = True
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
+# сессия и пользователь запроса - из кэша (см. core/auth.py);
+# просроченные сессии чистит clear_expired_sessions
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# ModelBackend - для сессий, открытых до перехода на кэш: в них
+# записан путь прежнего бэкенда, и без него в списке пользователь
+# оказался бы разлогинен. Убрать, когда такие сессии истекут
+# (SESSION_COOKIE_AGE)
+AUTHENTICATION_BACKENDS = [
+    'core.auth.CachedModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
@@ -156,6 +215,50 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CACHES = {
     'default': {
+        # один файл на все воркеры этого проекта: кэш страниц и
+        # версии лент общие (см. core/sqlite_cache.py); лежит рядом
+        # с базой, чтобы другие копии проекта на хосте его не делили
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache.sqlite3'),
+        'KEY_PREFIX': 'yatube',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+# manage.py test и pytest не должны читать и чистить кэш сайта
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    CACHES['default'] = {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_PREFIX': 'yatube-test',
     }
+
+# загрузки пишутся во временный файл кусками, а не держатся в памяти
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# ограничения для картинок постов (см. posts.uploads)
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 25_000_000
+# картинки больше по длинной стороне уменьшаются при загрузке
+POST_IMAGE_MAX_SIDE = 2048
+# миниатюры - в пуле процессов (см. posts.thumbnails); в тестах
+# сразу, иначе пул пишет файлы после удаления временного MEDIA_ROOT
+POST_THUMBNAILS_ASYNC = not TESTING
+
+# метрики запросов (см. core.middleware.PerformanceMiddleware),
+# смотреть на /admin/perf/
+PERF_SLOW_REQUEST_MS = 500
+# запросов к БД на страницу; в тестах превышение - ошибка
+PERF_QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 6,
+    'posts:profile': 8,
+    'posts:post_detail': 6,
+    'posts:post_comments': 4,
+    'posts:follow_index': 5,
+    'posts:search': 4,
 }
+PERF_ENFORCE_BUDGETS = False
@@ -17,8 +17,11 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 
+from core.views import perf_metrics
+
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('admin/perf/', perf_metrics, name='perf_metrics'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),